@@ -0,0 +1,69 @@
+"""
+Login throughput of the bcrypt process pool by worker count.
+
+Each case verifies a password ``logins`` times with ``concurrency`` calls
+in flight, and reports logins/sec plus how far the event loop fell behind
+a 10 ms ticker meanwhile (the inline case shows what the pool avoids).
+
+Run from the auth directory:
+    python -m benchmarks.password_hashing [rounds]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from passwords import PasswordHasher, hash_password, verify_password
+
+
+async def ticker_lag(stop: asyncio.Event) -> float:
+    """Worst delay of a 10 ms ticker while the case runs"""
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    while not stop.is_set():
+        expected = loop.time() + 0.01
+        await asyncio.sleep(0.01)
+        worst = max(worst, loop.time() - expected)
+    return worst
+
+
+async def run_case(verify, hashed: str, logins: int, concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            valid, _ = await verify('correct horse', hashed)
+            assert valid
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(ticker_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return logins / elapsed, await lag
+
+
+async def main(rounds: int = 12, logins: int = 32) -> None:
+    hashed = hash_password('correct horse', rounds)
+    cores = os.cpu_count() or 1
+    print(f'bcrypt rounds={rounds}, {logins} logins per case, {cores} cores')
+
+    async def inline(password, stored):
+        return verify_password(password, stored, rounds)
+
+    rate, lag = await run_case(inline, hashed, logins, concurrency=logins)
+    print(f'{"inline (on the loop)":24s} {rate:8.1f} logins/s  max loop lag {lag * 1000:8.1f} ms')
+
+    for workers in sorted({1, 2, 4, cores, cores * 2}):
+        hasher = PasswordHasher(rounds, workers=workers, max_queue=logins)
+        await hasher.start()
+        try:
+            rate, lag = await run_case(hasher.verify, hashed, logins, concurrency=logins)
+        finally:
+            await hasher.stop()
+        print(f'{f"process pool x{workers}":24s} {rate:8.1f} logins/s  max loop lag {lag * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:2])))
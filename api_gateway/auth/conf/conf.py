@@ -0,0 +1,51 @@
+from typing import Optional
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    # shared with the gateway, which enforces the same lifetime
+    ACCESS_TOKEN_DEFAULT_EXPIRE_MINUTES: int = 360
+
+    JWT_ALGORITHM: str = "RS256"
+    JWT_ISSUER: str = "auth"
+    # a new signing key is generated after this many minutes; retired keys
+    # stay published until every token they signed has expired
+    JWT_KEY_ROTATION_MINUTES: int = 1440
+    # directory of PEM private keys shared by all auth replicas; the newest
+    # file signs, every file is published. Keys are generated in memory if
+    # unset, which is only valid for a single auth replica
+    JWT_PRIVATE_KEYS_DIR: Optional[str] = None
+    # how often the key directory is checked for changes (or, without it,
+    # whether the in-memory key is due for rotation)
+    JWT_KEYS_CHECK_INTERVAL: float = 30.0
+
+    # bcrypt cost for new hashes; stored hashes with another cost are
+    # rehashed on the next login. Hashing runs in a process pool (0 workers
+    # means one per core) and calls beyond the queue get a 503
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PASSWORD_HASH_USE_PROCESSES: bool = True
+
+    # user table; login lookups are served from a bounded cache of records
+    # keyed by email and id, refreshed after USER_CACHE_TTL seconds
+    AUTH_DATABASE_URL: str = "sqlite+aiosqlite:///./auth.db"
+    AUTH_DATABASE_ECHO: bool = False
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: float = 30.0
+
+    # revoked token ids are stored in the user database and synced to the
+    # gateways through /revocations; expired ones are deleted this often
+    REVOCATION_PURGE_INTERVAL: float = 60.0
+
+    # event loop lag sentinel; stalls above the threshold log the loop's stack
+    LOOP_MONITOR_ENABLED: bool = False
+    LOOP_MONITOR_INTERVAL: float = 0.1
+    LOOP_MONITOR_THRESHOLD: float = 0.1
+
+    # JSON logs are written by a background thread; DEBUG records (e.g. one
+    # per completed request) are kept for this fraction of request ids
+    LOG_LEVEL: str = "INFO"
+    LOG_DEBUG_SAMPLE_RATE: float = 0.01
+    LOG_QUEUE_SIZE: int = 10000
+settings = Settings()
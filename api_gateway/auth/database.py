@@ -0,0 +1,51 @@
+from sqlalchemy import Float, Index, Integer, String, func
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from conf.conf import settings
+
+engine = create_async_engine(settings.AUTH_DATABASE_URL, echo=settings.AUTH_DATABASE_ECHO)
+
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class UserRecord(Base):
+    __tablename__ = 'users'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    username: Mapped[str] = mapped_column(String(50))
+    email: Mapped[str] = mapped_column(String(255))
+    password_hash: Mapped[str] = mapped_column(String(100))
+
+    __table_args__ = (
+        # emails are unique regardless of case; lookups filter on lower(email)
+        Index('ix_users_email_lower', func.lower(email), unique=True),
+    )
+
+
+class RevokedToken(Base):
+    __tablename__ = 'revoked_tokens'
+
+    # orders revocations across all replicas; gateways sync by it, so ids
+    # must never be reused (AUTOINCREMENT on SQLite)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    jti: Mapped[str] = mapped_column(String(64), unique=True)
+    expires_at: Mapped[float] = mapped_column(Float, index=True)
+
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+class AuthMeta(Base):
+    __tablename__ = 'auth_meta'
+
+    key: Mapped[str] = mapped_column(String(50), primary_key=True)
+    value: Mapped[str] = mapped_column(String(255))
+
+
+async def create_tables() -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
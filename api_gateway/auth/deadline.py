@@ -0,0 +1,76 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+# remaining budget in milliseconds, set by the gateway on every proxied call
+DEADLINE_HEADER = b'x-request-deadline-ms'
+
+current_deadline: ContextVar[Optional[float]] = ContextVar('current_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def remaining() -> Optional[float]:
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """Raise ``DeadlineExceeded`` once the caller has given up on the request"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+class DeadlineMiddleware:
+    """
+    Honor the gateway's deadline header: the request is cancelled when its
+    budget runs out and answered with 504 if nothing was sent yet.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        budget = None
+        if scope['type'] == 'http':
+            for name, value in scope['headers']:
+                if name == DEADLINE_HEADER:
+                    try:
+                        budget = int(value) / 1000
+                    except ValueError:
+                        pass
+                    break
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message['type'] == 'http.response.start':
+                started = True
+            await send(message)
+
+        token = current_deadline.set(time.monotonic() + budget)
+        try:
+            async with asyncio.timeout(max(0.0, budget)):
+                await self.app(scope, receive, send_wrapper)
+        except (TimeoutError, DeadlineExceeded):
+            if not started:
+                response = JSONResponse(
+                    {'detail': 'Request deadline exceeded'},
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT
+                )
+                await response(scope, receive, send)
+        finally:
+            current_deadline.reset(token)
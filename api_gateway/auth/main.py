@@ -1,23 +1,129 @@
-from fastapi import FastAPI,HTTPException,Depends
-from fastapi.responses import JSONResponse
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI,HTTPException,Depends,Header
+from fastapi.responses import JSONResponse, PlainTextResponse
+from deadline import DeadlineMiddleware
+from logs import RequestIdMiddleware, log_pipeline, setup_logging
+from loop_monitor import LoopMonitor, monitored
+from passwords import PasswordHasher, PasswordHasherBusy
+from revoked_tokens import RevokedTokenStore
 from schema.auth import LoginSchema,DeleteSchema,RegisterSchema,UpdateSchema
-app=FastAPI()
+from conf.conf import settings
+from database import create_tables
+from tokens import create_access_token,key_ring
+from users import User, UserExists, user_store
+
+setup_logging("auth", settings.LOG_LEVEL, settings.LOG_DEBUG_SAMPLE_RATE, settings.LOG_QUEUE_SIZE)
+logger = logging.getLogger(__name__)
+
+loop_monitor = (
+    LoopMonitor(settings.LOOP_MONITOR_INTERVAL, settings.LOOP_MONITOR_THRESHOLD)
+    if settings.LOOP_MONITOR_ENABLED
+    else None
+)
+password_hasher = PasswordHasher(
+    rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    use_processes=settings.PASSWORD_HASH_USE_PROCESSES
+)
+
+revoked_tokens = RevokedTokenStore(purge_interval=settings.REVOCATION_PURGE_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await create_tables()
+    await key_ring.start()
+    await password_hasher.start()
+    try:
+        async with monitored(loop_monitor):
+            yield
+    finally:
+        await password_hasher.stop()
+        await key_ring.stop()
+
+
+app=FastAPI(lifespan=lifespan)
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.get("/health", status_code=200)
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    lines = loop_monitor.render("auth") if loop_monitor is not None else []
+    for field, value in password_hasher.stats().items():
+        lines += [f"# TYPE auth_password_hash_{field} gauge", f"auth_password_hash_{field} {value}"]
+    for field, value in revoked_tokens.stats().items():
+        lines += [f"# TYPE auth_revocations_{field} gauge", f"auth_revocations_{field} {value}"]
+    for field, value in user_store.cache.stats().items():
+        lines += [f"# TYPE auth_user_cache_{field} gauge", f"auth_user_cache_{field} {value}"]
+    for field, value in log_pipeline.stats().items():
+        lines += [f"# TYPE auth_logging_{field} gauge", f"auth_logging_{field} {value}"]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/.well-known/jwks.json", status_code=200)
+async def jwks():
+    return JSONResponse(
+        key_ring.jwks(),
+        headers={"Cache-Control": "public, max-age=300"}
+    )
+
+
+def hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many concurrent logins, retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.get("/revocations", include_in_schema=False)
+async def revocations(epoch: Optional[str] = None, since: int = 0):
+    return await revoked_tokens.changes_since(epoch, since)
 
 
 @app.post("/login", status_code=200)
 async def login(payload: LoginSchema):
     try:
-        print("Login attempt with:", payload)
+        user = await user_store.get_by_email(payload.email)
+        valid, new_hash = await password_hasher.verify(
+            payload.password,
+            user.password_hash if user else None
+        )
+        if not valid:
+            logger.info("login failed", extra={"user_id": user.id if user else None})
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        if new_hash:
+            # the configured bcrypt cost changed since this hash was made
+            user = await user_store.set_password_hash(user, new_hash)
+
+        access_token = create_access_token(str(user.id))
+        logger.debug("login succeeded", extra={"user_id": user.id, "rehashed": new_hash is not None})
         return  JSONResponse(
             {"message": "Login successful",
+             "access_token": access_token,
+             "token_type": "bearer",
+             "expires_in": settings.ACCESS_TOKEN_DEFAULT_EXPIRE_MINUTES * 60,
              "user _data": {
-                 "username": payload.password,
-                 "email": payload.email
+                 "username": user.username,
+                 "email": user.email
              }},
             status_code=200
         )
-    except Exception as e:
-        print(e)
+    except HTTPException as he:
+        raise he
+    except PasswordHasherBusy:
+        raise hashing_busy()
+    except Exception:
+        logger.exception("login error")
         raise HTTPException(
             status_code=401,
             detail="Invalid credentials"
@@ -26,52 +132,93 @@ async def login(payload: LoginSchema):
 @app.post("/register", status_code=201)
 async def register(payload: RegisterSchema):
     try:
-        print("Registration attempt with:", payload)
-        user_data=payload.model_dump()
+        if payload.password != payload.confirm_password:
+            raise HTTPException(status_code=400, detail="Passwords do not match")
+        if await user_store.get_by_email(payload.email):
+            raise HTTPException(status_code=409, detail="Email already registered")
+        password_hash = await password_hasher.hash(payload.password)
+        user = await user_store.add(payload.username, payload.email, password_hash)
+        logger.info("user registered", extra={"user_id": user.id})
         return JSONResponse(
             {"message": "Registration successful",
              "user _data": {
-                 "username": user_data['username'],
-                 "email": user_data['email'],
-                 "password": user_data['password'],
-                 "confirm_password": user_data['confirm_password'],
+                 "id": user.id,
+                 "username": user.username,
+                 "email": user.email,
              }},
             status_code=201
         )
     except HTTPException as he:
         raise he
-    except Exception as e:
-        print(e)
+    except UserExists:
+        raise HTTPException(status_code=409, detail="Email already registered")
+    except PasswordHasherBusy:
+        raise hashing_busy()
+    except Exception:
+        logger.exception("registration error")
         raise HTTPException(
             status_code=500,
             detail="Registration failed"
         )
 
+async def current_user(x_user_id: Optional[int] = Header(default=None)):
+    # the gateway sets X-User-Id from the verified token's subject
+    user = await user_store.get_by_id(x_user_id) if x_user_id is not None else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user
+
+
 @app.delete("/delete", status_code=200)
-async def delete(payload: DeleteSchema):
+async def delete(
+    payload: DeleteSchema,
+    user: User = Depends(current_user),
+    x_token_id: Optional[str] = Header(default=None),
+    x_token_expires: Optional[float] = Header(default=None)
+):
+    if not x_token_id or x_token_expires is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if payload.user_id != user.id:
+        raise HTTPException(status_code=403, detail="Not allowed to log out another user")
     try:
-        print("Logout attempt for user:", payload.user_id)
+        await revoked_tokens.revoke(x_token_id, x_token_expires)
+        user_store.cache.invalidate(user)
+        logger.info("logged out", extra={"user_id": user.id})
         return JSONResponse(
             {"message": "Logout successful"},
             status_code=200
         )
-    except Exception as e:
-        print(e)
+    except Exception:
+        logger.exception("logout error")
         raise HTTPException(
             status_code=500,
             detail="Logout failed"
         )
 
 @app.put("/update", status_code=200)
-async def update(payload: UpdateSchema):
+async def update(payload: UpdateSchema, user: User = Depends(current_user)):
     try:
-        print("Update attempt with:", payload)
+        values = payload.model_dump(exclude_none=True, exclude={"password"})
+        if payload.password is not None:
+            values["password_hash"] = await password_hasher.hash(payload.password)
+        if values:
+            user = await user_store.update(user, **values)
+            logger.info("user updated", extra={"user_id": user.id, "fields": sorted(payload.model_fields_set)})
         return JSONResponse(
-            {"message": "Update successful"},
+            {"message": "Update successful",
+             "user _data": {
+                 "id": user.id,
+                 "username": user.username,
+                 "email": user.email,
+             }},
             status_code=200,
         )
-    except Exception as e:
-        print(e)
+    except UserExists:
+        raise HTTPException(status_code=409, detail="Email already registered")
+    except PasswordHasherBusy:
+        raise hashing_busy()
+    except Exception:
+        logger.exception("update error")
         raise HTTPException(
             status_code=500,
             detail="Update failed"
@@ -0,0 +1,136 @@
+"""
+bcrypt password hashing off the event loop.
+
+A bcrypt call at the default cost takes ~100-300 ms of CPU, so hashing
+and verification run in a process pool sized to the host. Calls are
+admitted up to the pool size plus PASSWORD_HASH_MAX_QUEUE; beyond that
+``PasswordHasherBusy`` is raised so the service can shed with 503 instead
+of queueing logins behind each other until they time out.
+
+Process workers find the hashing functions by module name, so they need
+this module importable as ``passwords``. When it is not (the service
+mounted into the gateway with the asgi transport), a thread pool is used.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+_this_module = sys.modules[__name__]
+
+# bcrypt only looks at the first 72 bytes; newer versions refuse longer input
+BCRYPT_MAX_BYTES = 72
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _secret(password: str) -> bytes:
+    return password.encode('utf-8')[:BCRYPT_MAX_BYTES]
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(rounds)).decode('ascii')
+
+
+def hash_rounds(hashed: str) -> int:
+    # $2b$<rounds>$<salt+checksum>
+    return int(hashed.split('$')[2])
+
+
+def verify_password(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """Check ``password``; on success also rehash it if the cost changed"""
+    if not bcrypt.checkpw(_secret(password), hashed.encode('ascii')):
+        return False, None
+    if hash_rounds(hashed) != rounds:
+        return True, hash_password(password, rounds)
+    return True, None
+
+
+def _warm_up() -> None:
+    pass
+
+
+def _importable() -> bool:
+    """Whether pickled references to this module's functions resolve"""
+    return sys.modules.get(__name__) is _this_module
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int, workers: int = 0, max_queue: int = 64, use_processes: bool = True):
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers + max_queue
+        self.use_processes = use_processes
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+        # verified against for unknown users, so a miss costs as much as a hit
+        self._dummy_hash = hash_password('dummy-password', rounds)
+
+    async def start(self) -> None:
+        if self._executor is not None:
+            return
+        if self.use_processes and not _importable():
+            logger.warning("'%s' is not importable, hashing in threads instead of processes", __name__)
+            self.use_processes = False
+        if self.use_processes:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            # start the workers now rather than on the first logins
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(self._executor, _warm_up)
+                for _ in range(self.workers)
+            ))
+        else:
+            # bcrypt releases the GIL, threads work where processes can't be used
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+
+    async def stop(self) -> None:
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy('Password hashing queue is full')
+        if self._executor is None:
+            await self.start()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (valid, new_hash). ``new_hash`` is set when the stored hash
+        used another cost and should replace it. A missing hash is checked
+        against a dummy one so unknown accounts are not faster to reject.
+        """
+        if hashed is None:
+            await self._run(verify_password, password, self._dummy_hash, self.rounds)
+            return False, None
+        return await self._run(verify_password, password, hashed, self.rounds)
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'pending': self.pending,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,86 @@
+"""
+Revoked access tokens, kept in the ``revoked_tokens`` table.
+
+Every auth replica writes to and reads from the same table, so gateways
+can pull from whichever replica answers and revocations survive restarts.
+Rows are numbered by their id; gateways ask for rows after the last id
+they saw. The epoch is stored with them and only changes when the
+database is recreated, in which case a full copy is sent.
+"""
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from database import AuthMeta, RevokedToken, SessionLocal
+
+EPOCH_KEY = 'revocation_epoch'
+
+
+class RevokedTokenStore:
+    def __init__(self, purge_interval: float = 60.0):
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+        self._epoch: Optional[str] = None
+        self.revoked = 0
+        self.purged = 0
+
+    async def epoch(self) -> str:
+        if self._epoch is None:
+            async with SessionLocal() as session:
+                epoch = await session.scalar(select(AuthMeta.value).where(AuthMeta.key == EPOCH_KEY))
+            if epoch is None:
+                try:
+                    async with SessionLocal.begin() as session:
+                        session.add(AuthMeta(key=EPOCH_KEY, value=uuid.uuid4().hex))
+                except IntegrityError:
+                    pass  # another replica created it first
+                async with SessionLocal() as session:
+                    epoch = await session.scalar(select(AuthMeta.value).where(AuthMeta.key == EPOCH_KEY))
+            self._epoch = epoch
+        return self._epoch
+
+    async def revoke(self, jti: str, exp: float) -> None:
+        if exp <= time.time():
+            return
+        try:
+            async with SessionLocal.begin() as session:
+                session.add(RevokedToken(jti=jti, expires_at=exp))
+        except IntegrityError:
+            return  # already revoked
+        self.revoked += 1
+
+    async def purge(self) -> int:
+        """Forget tokens that have expired anyway"""
+        async with SessionLocal.begin() as session:
+            result = await session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= time.time()))
+        self.purged += result.rowcount
+        return result.rowcount
+
+    async def maybe_purge(self) -> None:
+        if time.monotonic() >= self._next_purge:
+            self._next_purge = time.monotonic() + self.purge_interval
+            await self.purge()
+
+    async def changes_since(self, epoch: Optional[str], seq: int) -> Dict[str, Any]:
+        await self.maybe_purge()
+        current = await self.epoch()
+        full = epoch != current
+        query = select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at).where(
+            RevokedToken.expires_at > time.time()
+        ).order_by(RevokedToken.id)
+        if not full:
+            query = query.where(RevokedToken.id > seq)
+        async with SessionLocal() as session:
+            rows = (await session.execute(query)).all()
+        return {
+            'epoch': current,
+            'seq': rows[-1].id if rows else (0 if full else seq),
+            'full': full,
+            'revoked': [[row.jti, row.expires_at] for row in rows],
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {'revoked': self.revoked, 'purged': self.purged}
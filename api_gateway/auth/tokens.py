@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from conf.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SigningKey:
+    kid: str
+    private_key: Any
+    created_at: float
+    retired_at: Optional[float] = None
+
+
+class KeyRing:
+    """
+    RSA signing keys for access tokens.
+
+    The newest key signs. When it is older than the rotation interval a new
+    key takes over and the old one is retired but kept in the JWKS for one
+    token lifetime, so tokens it signed keep verifying until they expire.
+
+    Keys are loaded or generated by a background task (``start()``), in a
+    worker thread, so ``signing_key()`` and ``jwks()`` only read. With
+    ``keys_dir`` the directory is re-read whenever its mtime changes.
+    Without it every process signs with keys of its own, which only works
+    for a single auth replica: behind replicas the gateway would verify
+    against whichever replica served its JWKS.
+    """
+
+    def __init__(
+        self,
+        rotation_seconds: float,
+        overlap_seconds: float,
+        keys_dir: Optional[str] = None,
+        check_interval: float = 30.0
+    ):
+        self.rotation_seconds = rotation_seconds
+        self.overlap_seconds = overlap_seconds
+        self.keys_dir = keys_dir
+        self.check_interval = check_interval
+        self._keys: List[SigningKey] = []
+        self._jwks: Dict[str, List[Dict[str, Any]]] = {'keys': []}
+        self._dir_mtime: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _generate() -> SigningKey:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        return SigningKey(kid=uuid.uuid4().hex, private_key=private_key, created_at=time.time())
+
+    def _load(self) -> List[SigningKey]:
+        keys = []
+        for pem in sorted(Path(self.keys_dir).glob('*.pem'), key=lambda p: p.stat().st_mtime):
+            private_key = serialization.load_pem_private_key(pem.read_bytes(), password=None)
+            keys.append(SigningKey(kid=pem.stem, private_key=private_key, created_at=pem.stat().st_mtime))
+        if not keys:
+            raise RuntimeError(f"No private keys found in {self.keys_dir}")
+        return keys
+
+    def _set_keys(self, keys: List[SigningKey]) -> None:
+        jwks = []
+        for key in keys:
+            jwk = RSAAlgorithm.to_jwk(key.private_key.public_key(), as_dict=True)
+            jwk.update(kid=key.kid, use='sig', alg=settings.JWT_ALGORITHM)
+            jwks.append(jwk)
+        self._keys, self._jwks = keys, {'keys': jwks}
+
+    def _refresh(self) -> None:
+        """Reload or rotate the keys if needed; blocking, run in a thread"""
+        now = time.time()
+        if self.keys_dir:
+            # rotation is done by adding/removing files shared by all replicas
+            mtime = os.stat(self.keys_dir).st_mtime_ns
+            if mtime != self._dir_mtime:
+                self._set_keys(self._load())
+                self._dir_mtime = mtime
+            return
+
+        keys = list(self._keys)
+        if not keys or now - keys[-1].created_at >= self.rotation_seconds:
+            if keys:
+                keys[-1].retired_at = now
+            keys.append(self._generate())
+        keys = [
+            key for key in keys
+            if key.retired_at is None or now - key.retired_at < self.overlap_seconds
+        ]
+        if keys != self._keys:
+            self._set_keys(keys)
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await asyncio.to_thread(self._refresh)
+            except Exception:
+                logger.exception("Signing key refresh failed, keeping the current keys")
+
+    async def start(self) -> None:
+        if not self.keys_dir:
+            logger.warning(
+                "JWT_PRIVATE_KEYS_DIR is not set: this process signs with its own keys, "
+                "run a single auth replica or share a key directory"
+            )
+        await asyncio.to_thread(self._refresh)
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def signing_key(self) -> SigningKey:
+        if not self._keys:
+            # used before start(), e.g. from a script
+            self._refresh()
+        return self._keys[-1]
+
+    def jwks(self) -> Dict[str, List[Dict[str, Any]]]:
+        if not self._keys:
+            self._refresh()
+        return self._jwks
+
+
+key_ring = KeyRing(
+    rotation_seconds=settings.JWT_KEY_ROTATION_MINUTES * 60,
+    overlap_seconds=settings.ACCESS_TOKEN_DEFAULT_EXPIRE_MINUTES * 60,
+    keys_dir=settings.JWT_PRIVATE_KEYS_DIR,
+    check_interval=settings.JWT_KEYS_CHECK_INTERVAL
+)
+
+
+def create_access_token(subject: str, claims: Optional[Dict[str, Any]] = None) -> str:
+    key = key_ring.signing_key()
+    now = int(time.time())
+    payload = {
+        **(claims or {}),
+        'sub': subject,
+        'iss': settings.JWT_ISSUER,
+        'iat': now,
+        'exp': now + settings.ACCESS_TOKEN_DEFAULT_EXPIRE_MINUTES * 60,
+        'jti': uuid.uuid4().hex,
+    }
+    return jwt.encode(payload, key.private_key, algorithm=settings.JWT_ALGORITHM, headers={'kid': key.kid})
@@ -0,0 +1,137 @@
+"""
+Registered users, stored in the ``users`` table.
+
+Login looks users up by email on every request, so records are served from
+a bounded read-through cache keyed by lowercased email and by id. Entries
+expire after ``ttl`` seconds, which bounds staleness between replicas, and
+every write through ``UserStore`` invalidates them in this process.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from conf.conf import settings
+from database import SessionLocal, UserRecord
+
+
+@dataclass(frozen=True)
+class User:
+    id: int
+    username: str
+    email: str
+    password_hash: str
+
+    @classmethod
+    def from_record(cls, record: UserRecord) -> 'User':
+        return cls(record.id, record.username, record.email, record.password_hash)
+
+
+class UserExists(Exception):
+    pass
+
+
+class UserCache:
+    """LRU of ``User`` snapshots, reachable by ('email', email) and ('id', id)"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Tuple[str, Any], Tuple[User, float]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, Any]) -> Optional[User]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, user: User) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        for key in (('email', user.email.lower()), ('id', user.id)):
+            self._entries[key] = (user, expires_at)
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user: User) -> None:
+        self._entries.pop(('email', user.email.lower()), None)
+        self._entries.pop(('id', user.id), None)
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class UserStore:
+    def __init__(self, cache: UserCache):
+        self.cache = cache
+
+    async def get_by_email(self, email: str) -> Optional[User]:
+        key = ('email', email.lower())
+        user = self.cache.get(key)
+        if user is None:
+            async with SessionLocal() as session:
+                record = await session.scalar(
+                    select(UserRecord).where(func.lower(UserRecord.email) == key[1])
+                )
+            if record is None:
+                return None
+            user = User.from_record(record)
+            self.cache.set(user)
+        return user
+
+    async def get_by_id(self, user_id: int) -> Optional[User]:
+        user = self.cache.get(('id', user_id))
+        if user is None:
+            async with SessionLocal() as session:
+                record = await session.get(UserRecord, user_id)
+            if record is None:
+                return None
+            user = User.from_record(record)
+            self.cache.set(user)
+        return user
+
+    async def add(self, username: str, email: str, password_hash: str) -> User:
+        record = UserRecord(username=username, email=email, password_hash=password_hash)
+        try:
+            async with SessionLocal.begin() as session:
+                session.add(record)
+        except IntegrityError:
+            raise UserExists(email) from None
+        return User.from_record(record)
+
+    async def update(self, user: User, **values: Any) -> User:
+        """Change the given columns of ``user``, returning the new record"""
+        self.cache.invalidate(user)
+        try:
+            async with SessionLocal.begin() as session:
+                await session.execute(
+                    update(UserRecord).where(UserRecord.id == user.id).values(**values)
+                )
+        except IntegrityError:
+            raise UserExists(values.get('email', user.email)) from None
+        updated = User(**{**user.__dict__, **values})
+        self.cache.invalidate(updated)
+        return updated
+
+    async def set_password_hash(self, user: User, password_hash: str) -> User:
+        return await self.update(user, password_hash=password_hash)
+
+    async def delete(self, user: User) -> None:
+        self.cache.invalidate(user)
+        async with SessionLocal.begin() as session:
+            await session.execute(delete(UserRecord).where(UserRecord.id == user.id))
+
+
+user_store = UserStore(UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL))
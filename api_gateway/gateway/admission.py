@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+
+from conf.conf import settings
+from deadline import bounded
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # the shared limiter is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+        super().__init__(detail)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {'Retry-After': str(max(1, math.ceil(self.retry_after)))}
+
+
+def client_id(request: Request) -> str:
+    """
+    Identify the caller for rate limiting by IP. API keys and bearer tokens
+    are not verified yet at this point, so keying on them would give a
+    client a fresh bucket for every made-up header value.
+    """
+    return 'ip:' + (request.client.host if request.client else 'unknown')
+
+
+class MemoryRateLimiter:
+    """Token buckets per client, the least recently seen clients are dropped"""
+
+    def __init__(self, rate: float, burst: int, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def acquire(self, key: str, cost: float = 1.0) -> Optional[float]:
+        """Take ``cost`` tokens; return None if allowed, else seconds to wait"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return None
+        return (cost - bucket[0]) / self.rate
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisRateLimiter:
+    """Token buckets shared by every gateway replica, updated atomically in Lua"""
+    SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+    def __init__(self, rate: float, burst: int, url: str, namespace: str):
+        if aioredis is None:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the redis package is not installed")
+        self.rate = rate
+        self.burst = burst
+        self.namespace = namespace
+        self.client = aioredis.from_url(url)
+        self._script = self.client.register_script(self.SCRIPT)
+
+    async def acquire(self, key: str, cost: float = 1.0) -> Optional[float]:
+        try:
+            wait = float(await self._script(
+                keys=[f'gateway:ratelimit:{self.namespace}:{key}'],
+                args=[self.rate, self.burst, time.time(), cost]
+            ))
+        except Exception as e:
+            # fail open: an unavailable limiter must not take the gateway down
+            logger.warning("Rate limiter unavailable: %s", e)
+            return None
+        return wait or None
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+rate_limiters = []
+
+
+def make_rate_limiter(rate: float, burst: int, namespace: str = 'global'):
+    if settings.RATE_LIMIT_REDIS_URL:
+        limiter = RedisRateLimiter(rate, burst, settings.RATE_LIMIT_REDIS_URL, namespace)
+    else:
+        limiter = MemoryRateLimiter(rate, burst, settings.RATE_LIMIT_MAX_CLIENTS)
+    rate_limiters.append(limiter)
+    return limiter
+
+
+async def close_rate_limiters() -> None:
+    for limiter in rate_limiters:
+        await limiter.close()
+
+
+class Bulkhead:
+    """
+    Concurrency limit for one upstream with a short bounded wait queue.
+    Calls beyond ``max_concurrent`` wait up to ``queue_timeout`` seconds;
+    when ``max_queue`` callers are already waiting they are rejected at once.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    @property
+    def in_flight(self) -> int:
+        return self.max_concurrent - self._semaphore._value
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise AdmissionRejected(
+                    status.HTTP_503_SERVICE_UNAVAILABLE, 'Service is overloaded.', self.queue_timeout
+                )
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), bounded(self.queue_timeout))
+            except asyncio.TimeoutError:
+                raise AdmissionRejected(
+                    status.HTTP_503_SERVICE_UNAVAILABLE, 'Service is overloaded.', self.queue_timeout
+                )
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+class BulkheadRegistry:
+    def __init__(self):
+        self._bulkheads: Dict[str, Bulkhead] = {}
+
+    def get(self, service: str) -> Bulkhead:
+        bulkhead = self._bulkheads.get(service)
+        if bulkhead is None:
+            bulkhead = self._bulkheads[service] = Bulkhead(
+                max_concurrent=settings.UPSTREAM_MAX_CONCURRENCY,
+                max_queue=settings.UPSTREAM_MAX_QUEUE,
+                queue_timeout=settings.UPSTREAM_QUEUE_TIMEOUT
+            )
+        return bulkhead
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            service: {'in_flight': bulkhead.in_flight, 'waiting': bulkhead.waiting}
+            for service, bulkhead in self._bulkheads.items()
+        }
+
+
+bulkheads = BulkheadRegistry()
+
+global_rate_limiter = (
+    make_rate_limiter(settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST)
+    if settings.RATE_LIMIT_PER_SECOND > 0
+    else None
+)
+
+
+class AdmissionMiddleware:
+    """Apply the gateway-wide per-client rate limit before routing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or global_rate_limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = await global_rate_limiter.acquire(client_id(Request(scope)))
+        if retry_after is not None:
+            rejected = AdmissionRejected(status.HTTP_429_TOO_MANY_REQUESTS, 'Too many requests.', retry_after)
+            response = JSONResponse(
+                {'detail': rejected.detail},
+                status_code=rejected.status_code,
+                headers=rejected.headers
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
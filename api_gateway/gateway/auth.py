@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+import jwt
+from jwt import PyJWK
+
+from conf.conf import settings
+from exceptions import AuthTokenCorrupted, AuthTokenExpired, AuthTokenMissing
+from revocation import RevocationList
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    """
+    Public keys of the auth service, kept in memory so access tokens are
+    verified locally.
+
+    The key set is refreshed in the background every ``refresh_interval``
+    seconds. A token signed by an unknown ``kid`` (a freshly rotated key)
+    triggers an early refresh, at most once per ``min_refresh_interval``.
+    Failed refreshes keep the previous keys.
+    """
+
+    def __init__(self, url: str, refresh_interval: float, min_refresh_interval: float):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, PyJWK] = {}
+        self._fetch: Optional[Callable[[str], Awaitable[httpx.Response]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._last_refresh = float('-inf')
+
+    async def refresh(self) -> None:
+        async with self._lock:
+            self._last_refresh = time.monotonic()
+            try:
+                response = await (self._fetch or self._fetch_once)(self.url)
+                response.raise_for_status()
+                keys = {}
+                for jwk in response.json().get('keys', []):
+                    if jwk.get('kid'):
+                        keys[jwk['kid']] = PyJWK(jwk)
+                self._keys = keys
+            except Exception as e:
+                logger.warning("JWKS refresh from %s failed: %s", self.url, e)
+
+    @staticmethod
+    async def _fetch_once(url: str) -> httpx.Response:
+        async with httpx.AsyncClient() as client:
+            return await client.get(url)
+
+    async def get_key(self, kid: Optional[str]) -> Optional[PyJWK]:
+        key = self._keys.get(kid)
+        if key is None and kid and time.monotonic() - self._last_refresh >= self.min_refresh_interval:
+            await self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self, fetch: Optional[Callable[[str], Awaitable[httpx.Response]]] = None) -> None:
+        self._fetch = fetch
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._fetch = None
+
+
+jwks_cache = JWKSCache(
+    url=f'{settings.AUTH_SERVICE_URL}{settings.AUTH_JWKS_PATH}',
+    refresh_interval=settings.AUTH_JWKS_REFRESH_INTERVAL,
+    min_refresh_interval=settings.AUTH_JWKS_MIN_REFRESH_INTERVAL
+)
+
+
+class RevocationSync:
+    """
+    Pulls new token revocations from the auth service every ``interval``
+    seconds into a local ``RevocationList``.
+
+    Revocations live in the auth database, so any replica can answer. Each
+    poll asks for rows after the last seen id minus ``overlap``, since ids
+    from concurrent transactions may commit out of order; re-applying a
+    revocation is a no-op. A full copy (new epoch, i.e. a recreated
+    database) is merged, never used to drop what the gateway already has:
+    entries leave the list only when their tokens expire.
+    """
+
+    def __init__(self, url: str, interval: float, revocations: RevocationList, overlap: int = 100):
+        self.url = url
+        self.interval = interval
+        self.revocations = revocations
+        self.overlap = overlap
+        self._epoch: Optional[str] = None
+        self._seq = 0
+        self._fetch: Optional[Callable[[str], Awaitable[httpx.Response]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def sync(self) -> None:
+        since = max(0, self._seq - self.overlap)
+        url = str(httpx.URL(self.url, params={'epoch': self._epoch or '', 'since': since}))
+        try:
+            response = await (self._fetch or JWKSCache._fetch_once)(url)
+            response.raise_for_status()
+            changes = response.json()
+            self.revocations.apply(changes['revoked'])
+            if changes['full']:
+                self._seq = changes['seq']
+            else:
+                self._seq = max(self._seq, changes['seq'])
+            self._epoch = changes['epoch']
+        except Exception as e:
+            logger.warning("Revocation sync from %s failed: %s", self.url, e)
+
+    async def _sync_periodically(self) -> None:
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.interval)
+
+    def start(self, fetch: Optional[Callable[[str], Awaitable[httpx.Response]]] = None) -> None:
+        self._fetch = fetch
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._fetch = None
+
+
+revocation_list = RevocationList(
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+    error_rate=settings.REVOCATION_BLOOM_ERROR_RATE
+)
+
+revocation_sync = RevocationSync(
+    url=f'{settings.AUTH_SERVICE_URL}{settings.AUTH_REVOCATIONS_PATH}',
+    interval=settings.REVOCATION_SYNC_INTERVAL,
+    revocations=revocation_list,
+    overlap=settings.REVOCATION_SYNC_OVERLAP
+)
+
+
+async def decode_access_token(authorization: str) -> Dict[str, Any]:
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        raise AuthTokenMissing("Bearer token missing")
+
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.PyJWTError:
+        raise AuthTokenCorrupted("Malformed token")
+
+    key = await jwks_cache.get_key(header.get('kid'))
+    if key is None:
+        raise AuthTokenCorrupted("Unknown token signing key")
+
+    try:
+        payload = jwt.decode(
+            token,
+            key.key,
+            algorithms=settings.JWT_ALGORITHMS,
+            issuer=settings.JWT_ISSUER,
+            leeway=settings.JWT_LEEWAY,
+            options={'require': ['exp', 'iat', 'sub']}
+        )
+    except jwt.ExpiredSignatureError:
+        raise AuthTokenExpired("Token has expired")
+    except jwt.PyJWTError as e:
+        raise AuthTokenCorrupted(str(e))
+
+    # never accept a token for longer than the gateway's configured lifetime
+    payload['exp'] = min(payload['exp'], payload['iat'] + settings.ACCESS_TOKEN_DEFAULT_EXPIRE_MINUTES * 60)
+    if payload['exp'] + settings.JWT_LEEWAY <= time.time():
+        raise AuthTokenExpired("Token has expired")
+    return payload
+
+
+def is_admin_user(token_payload: Dict[str, Any]) -> bool:
+    return bool(token_payload.get('is_admin', False))
+
+
+def generate_request_header(token_payload: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        'X-User-Id': str(token_payload['sub']),
+        'X-Token-Id': str(token_payload.get('jti', '')),
+        'X-Token-Expires': str(int(token_payload['exp'])),
+    }
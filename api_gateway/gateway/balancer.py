@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from conf.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Replica:
+    __slots__ = ('url', 'outstanding', 'healthy', 'failures', 'ejected_until', 'readmitted_at')
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.readmitted_at = float('-inf')
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+    def load(self, now: float) -> float:
+        """Outstanding requests, inflated while the replica is warming up again"""
+        warmup = (now - self.readmitted_at) / settings.UPSTREAM_SLOW_START_SECONDS if settings.UPSTREAM_SLOW_START_SECONDS else 1.0
+        return (self.outstanding + 1) / min(1.0, max(0.1, warmup))
+
+
+class ReplicaSet:
+    """
+    Replicas behind one logical service URL, balanced with power-of-two
+    choices on outstanding requests.
+
+    ``UPSTREAM_UNHEALTHY_THRESHOLD`` consecutive failures (passive, from
+    proxied calls, or active, from health probes) eject a replica for
+    ``UPSTREAM_EJECTION_SECONDS``; a replica coming back is weighted down
+    for ``UPSTREAM_SLOW_START_SECONDS`` so it is re-admitted gradually. If no
+    replica is available the least loaded one is used anyway.
+    """
+
+    def __init__(self, service_url: str, replica_urls: List[str]):
+        self.service_url = service_url.rstrip('/')
+        self.replicas = [Replica(url) for url in replica_urls]
+
+    def pick(self) -> Replica:
+        now = time.monotonic()
+        candidates = [replica for replica in self.replicas if replica.available(now)] or self.replicas
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.sample(candidates, 2)
+        return first if first.load(now) <= second.load(now) else second
+
+    def rewrite(self, url: str, replica: Replica) -> str:
+        return replica.url + url[len(self.service_url):]
+
+    def record(self, replica: Replica, failed: bool) -> None:
+        if not failed:
+            replica.failures = 0
+            return
+        replica.failures += 1
+        if replica.failures >= settings.UPSTREAM_UNHEALTHY_THRESHOLD and replica.ejected_until <= time.monotonic():
+            self._eject(replica)
+
+    def _eject(self, replica: Replica) -> None:
+        logger.warning("Ejecting upstream replica %s", replica.url)
+        replica.ejected_until = time.monotonic() + settings.UPSTREAM_EJECTION_SECONDS
+
+    def mark_probe(self, replica: Replica, ok: bool) -> None:
+        now = time.monotonic()
+        if ok:
+            if not replica.healthy or replica.ejected_until > 0:
+                replica.readmitted_at = now
+            replica.healthy = True
+            replica.failures = 0
+            if replica.ejected_until <= now:
+                replica.ejected_until = 0.0
+            return
+        replica.failures += 1
+        if replica.failures >= settings.UPSTREAM_UNHEALTHY_THRESHOLD:
+            replica.healthy = False
+
+
+class LoadBalancer:
+    def __init__(self):
+        self._sets: Dict[str, ReplicaSet] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(self, service_url: str, replica_urls: List[str]) -> None:
+        if replica_urls:
+            self._sets[service_url.rstrip('/')] = ReplicaSet(service_url, replica_urls)
+
+    def replica_set(self, url: str) -> Optional[ReplicaSet]:
+        for service_url, replica_set in self._sets.items():
+            if url.startswith(service_url):
+                return replica_set
+        return None
+
+    def replica_urls(self) -> List[str]:
+        return [replica.url for replica_set in self._sets.values() for replica in replica_set.replicas]
+
+    async def _probe(self, get_client: Callable[[str], httpx.AsyncClient], replica_set: ReplicaSet, replica: Replica) -> None:
+        try:
+            response = await get_client(replica.url).get(
+                replica.url + settings.UPSTREAM_HEALTH_PATH,
+                timeout=settings.UPSTREAM_HEALTH_TIMEOUT
+            )
+            ok = response.status_code < 500
+        except httpx.HTTPError:
+            ok = False
+        replica_set.mark_probe(replica, ok)
+
+    async def _probe_periodically(self, get_client: Callable[[str], httpx.AsyncClient]) -> None:
+        while True:
+            await asyncio.gather(*(
+                self._probe(get_client, replica_set, replica)
+                for replica_set in self._sets.values()
+                for replica in replica_set.replicas
+            ))
+            await asyncio.sleep(settings.UPSTREAM_HEALTH_INTERVAL)
+
+    def start(self, get_client: Callable[[str], httpx.AsyncClient]) -> None:
+        if self._sets and settings.UPSTREAM_HEALTH_INTERVAL > 0 and self._task is None:
+            self._task = asyncio.create_task(self._probe_periodically(get_client))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, List[Dict]]:
+        now = time.monotonic()
+        return {
+            service_url: [
+                {'url': replica.url, 'outstanding': replica.outstanding, 'available': replica.available(now)}
+                for replica in replica_set.replicas
+            ]
+            for service_url, replica_set in self._sets.items()
+        }
+
+
+load_balancer = LoadBalancer()
+load_balancer.configure(settings.AUTH_SERVICE_URL, settings.AUTH_SERVICE_REPLICAS)
+load_balancer.configure(settings.MLDATASET_SERVICE_URL, settings.MLDATASET_SERVICE_REPLICAS)
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from fastapi import Request, Response, status
+from starlette.routing import Match
+
+from conf.conf import settings
+from admission import client_id, global_rate_limiter
+from compression import compress_response
+from core import APIError, proxy_request
+from deadline import current_deadline, remaining, request_deadline
+from metrics import StageTimer, current_stages
+from schema.batch import BatchItem, BatchRequest
+
+# request headers not carried over from the batch request to its items
+ITEM_HEADER_EXCLUDE = frozenset({b'accept-encoding', b'content-length', b'content-type', b'transfer-encoding'})
+
+
+def match_route(request: Request, method: str, path: str) -> Optional[tuple]:
+    """Find the ``route()`` registration serving ``method path``"""
+    scope = {**request.scope, 'method': method, 'path': path}
+    for candidate in request.app.router.routes:
+        match, child_scope = candidate.matches(scope)
+        if match == Match.FULL and hasattr(getattr(candidate, 'endpoint', None), 'route_spec'):
+            return candidate.endpoint.route_spec, child_scope
+    return None
+
+
+def item_request(request: Request, item: BatchItem, child_scope: Dict[str, Any]) -> Request:
+    url = urlsplit(item.path)
+    body = b'' if item.body is None else json.dumps(item.body).encode()
+    headers = [
+        (name, value) for name, value in request.scope['headers']
+        if name not in ITEM_HEADER_EXCLUDE
+    ]
+    if body:
+        headers.append((b'content-type', b'application/json'))
+
+    async def receive() -> Dict[str, Any]:
+        # raw_body routes read the item body from the request stream
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    scope = {
+        **request.scope,
+        **child_scope,
+        'method': item.method,
+        'path': url.path,
+        'raw_path': url.path.encode(),
+        'query_string': url.query.encode(),
+        'headers': headers,
+    }
+    return Request(scope, receive)
+
+
+def item_result(status_code: int, body: bytes, media_type: Optional[str]) -> bytes:
+    """Embed a JSON upstream body as-is; anything else as a string"""
+    if not body:
+        payload = b'null'
+    elif media_type and 'json' in media_type:
+        payload = body
+    else:
+        payload = json.dumps(body.decode('utf-8', errors='replace')).encode()
+    return b'{"status":%d,"body":%s}' % (status_code, payload)
+
+
+async def run_item(
+    request: Request,
+    item: BatchItem,
+    semaphore: asyncio.Semaphore,
+    auth_memo: Dict[Any, Any],
+    client: str
+) -> bytes:
+    matched = match_route(request, item.method, urlsplit(item.path).path)
+    if matched is None:
+        return item_result(status.HTTP_404_NOT_FOUND, b'{"detail":"Not Found"}', 'application/json')
+    spec, child_scope = matched
+    if spec.form_data or spec.stream_response:
+        return item_result(
+            status.HTTP_400_BAD_REQUEST,
+            b'{"detail":"Streamed routes cannot be batched"}',
+            'application/json'
+        )
+
+    # the middleware charged the batch request once; every item is charged
+    # too, or a batch would get BATCH_MAX_ITEMS requests for one token
+    if global_rate_limiter is not None:
+        retry_after = await global_rate_limiter.acquire(client)
+        if retry_after is not None:
+            return item_result(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                json.dumps({'detail': 'Too many requests.', 'retry_after': retry_after}).encode(),
+                'application/json'
+            )
+
+    # the batch deadline bounds the wait for a slot, then the item runs under
+    # its route's own timeout as well, like the same call made directly
+    try:
+        async with asyncio.timeout(remaining()):
+            await semaphore.acquire()
+    except TimeoutError:
+        return item_result(status.HTTP_504_GATEWAY_TIMEOUT, b'{"detail":"Gateway timeout"}', 'application/json')
+
+    # items are timed and counted under their own route, like direct calls
+    stages = StageTimer()
+    stages_token = current_stages.set(stages)
+    deadline_token = current_deadline.set(min(current_deadline.get(), time.monotonic() + spec.timeout))
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    try:
+        async with asyncio.timeout(remaining()):
+            response = await proxy_request(
+                spec,
+                item_request(request, item, child_scope),
+                {spec.payload_key: item.body} if item.body is not None else {},
+                auth_memo
+            )
+        status_code = response.status_code
+    except TimeoutError:
+        status_code = status.HTTP_504_GATEWAY_TIMEOUT
+        spec.metrics.error(status_code)
+        return item_result(status_code, b'{"detail":"Gateway timeout"}', 'application/json')
+    except APIError as e:
+        status_code = e.status_code
+        spec.metrics.error(status_code)
+        return item_result(e.status_code, json.dumps({'detail': e.detail}).encode(), 'application/json')
+    finally:
+        spec.metrics.observe(stages, time.perf_counter() - stages.started, status_code)
+        current_deadline.reset(deadline_token)
+        current_stages.reset(stages_token)
+        semaphore.release()
+    return item_result(response.status_code, response.body, response.media_type)
+
+
+async def run_batch(request: Request, batch: BatchRequest) -> Response:
+    """
+    Run the sub-requests of a batch concurrently, at most
+    BATCH_MAX_CONCURRENCY at a time, against the routes registered with
+    ``route()``. Tokens are verified once for the whole batch and every
+    item gets its own status and body in the response, in request order.
+    Each routed item costs one token of the client's global rate limit;
+    items over the limit get a 429 of their own. Items run under their
+    route's timeout, capped by what is left of the batch's, and get a 504
+    of their own when it runs out.
+    """
+    semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+    auth_memo: Dict[Any, Any] = {}
+    client = client_id(request)
+
+    token = current_deadline.set(request_deadline(request, settings.GATEWAY_TIMEOUT))
+    try:
+        results: List[bytes] = await asyncio.gather(*(
+            run_item(request, item, semaphore, auth_memo, client)
+            for item in batch.requests
+        ))
+    finally:
+        current_deadline.reset(token)
+
+    return await compress_response(
+        Response(
+            content=b'{"responses":[' + b','.join(results) + b']}',
+            media_type='application/json'
+        ),
+        request.headers.get('accept-encoding')
+    )
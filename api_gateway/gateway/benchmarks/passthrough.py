@@ -0,0 +1,74 @@
+"""
+Micro-benchmark of the gateway response path.
+
+Compares the previous ``response.json()`` + ``jsonable_encoder`` round trip
+with the raw passthrough and the cached ``TypeAdapter`` path used by
+``core.encode_response``.
+
+Run from the gateway directory:
+    python -m benchmarks.passthrough
+"""
+import timeit
+from datetime import datetime
+from typing import List
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from core import encode_response
+
+
+class DatasetOut(BaseModel):
+    id: int
+    name: str
+    path: str
+    storage: str
+    visible: str
+    created_at: datetime
+
+
+def sample_upstream(rows: int) -> httpx.Response:
+    data = [
+        {
+            'id': i,
+            'name': f'dataset_{i}',
+            'path': f'static/mldatabase/dataset_{i}_0a1b2c3d',
+            'storage': 'local',
+            'visible': 'public',
+            'created_at': '2024-01-01T00:00:00'
+        }
+        for i in range(rows)
+    ]
+    return httpx.Response(200, json=data)
+
+
+def old_passthrough(upstream: httpx.Response) -> bytes:
+    return JSONResponse(jsonable_encoder(upstream.json())).body
+
+
+def old_validated(upstream: httpx.Response, model) -> bytes:
+    value = TypeAdapter(model).validate_python(upstream.json())
+    return JSONResponse(jsonable_encoder(value)).body
+
+
+def main(rows: int = 500, number: int = 200) -> None:
+    upstream = sample_upstream(rows)
+    model = List[DatasetOut]
+    adapter = TypeAdapter(model)
+
+    cases = {
+        'old json()+jsonable_encoder': lambda: old_passthrough(upstream),
+        'new raw passthrough': lambda: encode_response(upstream).body,
+        'old validated (per request)': lambda: old_validated(upstream, model),
+        'new validated (cached adapter)': lambda: encode_response(upstream, adapter).body,
+    }
+    print(f'{rows} rows, {number} iterations')
+    for name, case in cases.items():
+        elapsed = min(timeit.repeat(case, number=number, repeat=3))
+        print(f'{name:32s} {elapsed / number * 1e6:10.1f} us/op')
+
+
+if __name__ == '__main__':
+    main()
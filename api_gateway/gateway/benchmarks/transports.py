@@ -0,0 +1,82 @@
+"""
+Per-hop cost of the gateway -> service transports.
+
+Sends GET /health to the auth service over loopback TCP, a Unix domain
+socket and in-process ``httpx.ASGITransport``, sequentially and with a
+few requests in flight. The TCP and UDS servers are separate uvicorn
+processes, as in a co-located deployment.
+
+Run from the gateway directory:
+    python -m benchmarks.transports
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from transport import load_service_app
+
+AUTH_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'auth'))
+PORT = 18002
+
+
+def spawn(*bind: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--app-dir', AUTH_DIR, '--log-level', 'warning', *bind],
+        cwd=AUTH_DIR
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, url: str) -> None:
+    for _ in range(100):
+        try:
+            await client.get(url)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError('auth service did not start')
+
+
+async def measure(client: httpx.AsyncClient, url: str, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            (await client.get(url)).raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return (time.perf_counter() - started) / requests
+
+
+async def main(requests: int = 2000) -> None:
+    socket_path = os.path.join(tempfile.mkdtemp(), 'auth.sock')
+    servers = [spawn('--port', str(PORT)), spawn('--uds', socket_path)]
+    cases = {
+        'tcp': (httpx.AsyncClient(), f'http://127.0.0.1:{PORT}/health'),
+        'uds': (httpx.AsyncClient(transport=httpx.AsyncHTTPTransport(uds=socket_path)), 'http://auth/health'),
+        'asgi': (httpx.AsyncClient(transport=httpx.ASGITransport(app=load_service_app(AUTH_DIR))), 'http://auth/health'),
+    }
+    try:
+        for client, url in cases.values():
+            await wait_ready(client, url)
+        print(f'{requests} requests per case')
+        for concurrency in (1, 16):
+            for name, (client, url) in cases.items():
+                await measure(client, url, 200, concurrency)
+                elapsed = await measure(client, url, requests, concurrency)
+                print(f'{name:5s} concurrency={concurrency:<3d} {elapsed * 1e6:10.1f} us/request')
+    finally:
+        for client, _ in cases.values():
+            await client.aclose()
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
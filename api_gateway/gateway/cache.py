@@ -0,0 +1,285 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import Request, Response
+
+from conf.conf import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # the shared tier is optional
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    __slots__ = ('status_code', 'media_type', 'body', 'etag', 'expires_at')
+
+    def __init__(self, status_code: int, media_type: Optional[str], body: bytes, etag: str, expires_at: float):
+        self.status_code = status_code
+        self.media_type = media_type
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_response(cls, response: Response, ttl: float) -> 'CachedResponse':
+        etag = '"%s"' % hashlib.blake2b(response.body, digest_size=16).hexdigest()
+        return cls(response.status_code, response.media_type, response.body, etag, time.time() + ttl)
+
+    def to_response(self) -> Response:
+        return Response(
+            content=self.body,
+            status_code=self.status_code,
+            media_type=self.media_type,
+            headers={'ETag': self.etag}
+        )
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers={'ETag': self.etag})
+
+    def dumps(self) -> bytes:
+        meta = json.dumps([self.status_code, self.media_type, self.etag, self.expires_at])
+        return meta.encode() + b'\n' + self.body
+
+    @classmethod
+    def loads(cls, raw: bytes) -> 'CachedResponse':
+        meta, body = raw.split(b'\n', 1)
+        status_code, media_type, etag, expires_at = json.loads(meta)
+        return cls(status_code, media_type, body, etag, expires_at)
+
+
+class MemoryTier:
+    """In-process LRU bounded by the total size of the cached bodies"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        self._variants: Dict[str, Set[str]] = {}
+
+    def get(self, path: str, variant: str) -> Optional[CachedResponse]:
+        entry = self._entries.get((path, variant))
+        if entry is None:
+            return None
+        if entry.expires_at <= time.time():
+            self._remove((path, variant))
+            return None
+        self._entries.move_to_end((path, variant))
+        return entry
+
+    def set(self, path: str, variant: str, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_bytes:
+            return
+        self._remove((path, variant))
+        self._entries[(path, variant)] = entry
+        self._variants.setdefault(path, set()).add(variant)
+        self.size += len(entry.body)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._variants.clear()
+        self.size = 0
+
+    def invalidate(self, path: str) -> None:
+        for variant in self._variants.pop(path, ()):
+            entry = self._entries.pop((path, variant), None)
+            if entry is not None:
+                self.size -= len(entry.body)
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry.body)
+        variants = self._variants.get(key[0])
+        if variants is not None:
+            variants.discard(key[1])
+            if not variants:
+                del self._variants[key[0]]
+
+
+class RedisTier:
+    """
+    Shared tier: one Redis hash per path holding every cached variant, so
+    invalidating a path is a single DEL. Invalidations are also published
+    so other gateway replicas drop their in-process copies.
+    """
+    PREFIX = 'gateway:cache:'
+    CHANNEL = 'gateway:cache:invalidate'
+    RECONNECT_BACKOFF = 0.5
+    RECONNECT_MAX_BACKOFF = 30.0
+
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, path: str, variant: str) -> Optional[CachedResponse]:
+        raw = await self.client.hget(self.PREFIX + path, variant)
+        if raw is None:
+            return None
+        entry = CachedResponse.loads(raw)
+        return entry if entry.expires_at > time.time() else None
+
+    async def set(self, path: str, variant: str, entry: CachedResponse, ttl: float) -> None:
+        key = self.PREFIX + path
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hset(key, variant, entry.dumps())
+            pipe.expire(key, max(1, int(ttl)))
+            await pipe.execute()
+
+    async def invalidate(self, path: str) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(self.PREFIX + path)
+            pipe.publish(self.CHANNEL, path)
+            await pipe.execute()
+
+    async def listen(self, memory: MemoryTier) -> None:
+        """
+        Apply invalidations published by other replicas, resubscribing with
+        backoff when the connection fails. Invalidations missed while
+        disconnected are unknown, so the in-process tier is cleared after
+        each reconnect.
+        """
+        backoff = self.RECONNECT_BACKOFF
+        failed = False
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.CHANNEL)
+                if failed:
+                    logger.info("Response cache invalidation channel reconnected")
+                    memory.clear()
+                    failed = False
+                backoff = self.RECONNECT_BACKOFF
+                async for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        path = message['data']
+                        memory.invalidate(path.decode() if isinstance(path, bytes) else path)
+            except Exception as e:
+                logger.warning("Response cache invalidation channel failed, retrying in %.1fs: %s", backoff, e)
+                failed = True
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+            backoff = min(self.RECONNECT_MAX_BACKOFF, backoff * 2)
+
+
+class ResponseCache:
+    """
+    Two-tier cache for idempotent proxied responses.
+
+    Entries are stored per request path and variant (query string plus the
+    route's ``vary_on`` headers) and carry an ETag so a matching
+    ``If-None-Match`` is answered with 304 without calling the upstream.
+    Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self, max_bytes: int, redis_url: Optional[str] = None):
+        self.memory = MemoryTier(max_bytes)
+        self.redis_url = redis_url
+        self.redis: Optional[RedisTier] = None
+        self.enabled = False
+        self.hits = 0
+        self.misses = 0
+        self._listener: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def variant(request: Request, vary_on: Iterable[str]) -> str:
+        parts = [request.url.query]
+        parts.extend(request.headers.get(header, '') for header in vary_on)
+        return hashlib.blake2b('\0'.join(parts).encode(), digest_size=16).hexdigest()
+
+    async def get(self, path: str, variant: str) -> Optional[CachedResponse]:
+        entry = self.memory.get(path, variant)
+        if entry is None and self.redis is not None:
+            try:
+                entry = await self.redis.get(path, variant)
+            except Exception as e:
+                logger.warning("Response cache read failed: %s", e)
+            if entry is not None:
+                self.memory.set(path, variant, entry)
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def set(self, path: str, variant: str, entry: CachedResponse, ttl: float) -> None:
+        self.memory.set(path, variant, entry)
+        if self.redis is not None:
+            try:
+                await self.redis.set(path, variant, entry, ttl)
+            except Exception as e:
+                logger.warning("Response cache write failed: %s", e)
+
+    async def invalidate(self, paths: Iterable[str]) -> None:
+        for path in paths:
+            self.memory.invalidate(path)
+            if self.redis is not None:
+                try:
+                    await self.redis.invalidate(path)
+                except Exception as e:
+                    logger.warning("Response cache invalidation failed: %s", e)
+
+    async def start(self) -> None:
+        if not (self.enabled and self.redis_url):
+            return
+        if aioredis is None:
+            raise RuntimeError("RESPONSE_CACHE_REDIS_URL is set but the redis package is not installed")
+        self.redis = RedisTier(aioredis.from_url(self.redis_url))
+        self._listener = asyncio.create_task(self.redis.listen(self.memory))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                logger.exception("Response cache listener failed")
+            self._listener = None
+        if self.redis is not None:
+            try:
+                await self.redis.client.aclose()
+            except Exception as e:
+                logger.warning("Response cache connection close failed: %s", e)
+            self.redis = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self.memory._entries),
+            'bytes': self.memory.size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(
+        tag.strip().removeprefix('W/') == etag
+        for tag in if_none_match.split(',')
+    )
+
+
+response_cache = ResponseCache(
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    redis_url=settings.RESPONSE_CACHE_REDIS_URL
+)
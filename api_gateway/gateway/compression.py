@@ -0,0 +1,174 @@
+"""
+Response compression negotiated from the client's ``Accept-Encoding``.
+
+Bodies the gateway builds are compressed with the best coding the client
+accepts (zstd, br, gzip - br and zstd only when ``brotli``/``zstandard``
+are installed). Upstream bodies that arrive already compressed in a
+coding the client accepts are relayed as-is, without the
+decompress/recompress round trip.
+"""
+import asyncio
+import gzip
+import threading
+from typing import Callable, Dict, Optional
+
+import httpx
+from fastapi import Response
+
+from conf.conf import settings
+
+try:
+    import brotli
+except ImportError:  # br is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional
+    zstandard = None
+
+# httpx response extension holding the body as the upstream encoded it
+RAW_CONTENT = 'gateway.raw_content'
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/xml',
+    'application/javascript',
+    'text/',
+)
+
+
+_local = threading.local()
+
+
+def _zstd_compress(body: bytes) -> bytes:
+    # a ZstdCompressor must not be shared between threads, and large bodies
+    # are compressed in worker threads; keep one per thread
+    compressor = getattr(_local, 'zstd', None)
+    if compressor is None:
+        compressor = _local.zstd = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL)
+    return compressor.compress(body)
+
+
+def _encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    encoders = {}
+    if zstandard is not None:
+        encoders['zstd'] = _zstd_compress
+    if brotli is not None:
+        encoders['br'] = lambda body: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_LEVEL)
+    encoders['gzip'] = lambda body: gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+    return encoders
+
+
+# in order of preference when the client weighs codings equally
+ENCODERS = _encoders()
+
+
+def accepted_codings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Parse ``Accept-Encoding`` into {coding: q}"""
+    codings = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def accepts(accept_encoding: Optional[str], coding: str) -> bool:
+    codings = accepted_codings(accept_encoding)
+    return codings.get(coding, codings.get('*', 0.0)) > 0
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """The supported coding the client prefers, None for identity"""
+    codings = accepted_codings(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in ENCODERS:
+        q = codings.get(coding, codings.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def is_compressible(media_type: Optional[str]) -> bool:
+    return bool(media_type) and media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def weak_etag(etag: str) -> str:
+    """A coded body is a different representation, so its validator is weak"""
+    return etag if etag.startswith('W/') else f'W/{etag}'
+
+
+async def read_undecoded(client: httpx.AsyncClient, request: httpx.Request) -> httpx.Response:
+    """
+    Send ``request`` and buffer the body exactly as the upstream encoded it.
+
+    The returned response keeps those bytes under ``RAW_CONTENT`` and only
+    decodes them when ``read()`` is called.
+    """
+    response = await client.send(request, stream=True)
+    try:
+        raw = b''.join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+    return httpx.Response(
+        status_code=response.status_code,
+        headers=response.headers,
+        stream=httpx.ByteStream(raw),
+        request=request,
+        extensions={**response.extensions, RAW_CONTENT: raw}
+    )
+
+
+def passthrough_body(upstream: httpx.Response, accept_encoding: Optional[str]) -> Optional[bytes]:
+    """The upstream's still-encoded body, if the client accepts its coding"""
+    raw = upstream.extensions.get(RAW_CONTENT)
+    coding = upstream.headers.get('content-encoding')
+    if raw is None or not coding or coding == 'identity':
+        return None
+    return raw if accepts(accept_encoding, coding) else None
+
+
+async def compress_response(response: Response, accept_encoding: Optional[str]) -> Response:
+    """Compress a buffered gateway response in place when worthwhile"""
+    body = getattr(response, 'body', None)
+    if (
+        not settings.COMPRESSION_ENABLED
+        or not body
+        or len(body) < settings.COMPRESSION_MIN_SIZE
+        or 'content-encoding' in response.headers
+        or not is_compressible(response.media_type or response.headers.get('content-type'))
+    ):
+        return response
+
+    coding = negotiate(accept_encoding)
+    if coding is None:
+        response.headers['vary'] = 'Accept-Encoding'
+        return response
+
+    encode = ENCODERS[coding]
+    if len(body) >= settings.COMPRESSION_OFFLOAD_SIZE:
+        # zlib, brotli and zstd release the GIL
+        compressed = await asyncio.to_thread(encode, body)
+    else:
+        compressed = encode(body)
+    if len(compressed) >= len(body):
+        return response
+
+    response.body = compressed
+    response.headers['content-length'] = str(len(compressed))
+    response.headers['content-encoding'] = coding
+    response.headers['vary'] = 'Accept-Encoding'
+    if 'etag' in response.headers:
+        response.headers['etag'] = weak_etag(response.headers['etag'])
+    return response
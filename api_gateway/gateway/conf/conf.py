@@ -1,4 +1,5 @@
 import os
+from typing import List, Literal, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -7,4 +8,120 @@ class Settings(BaseSettings):
     MLDATASET_SERVICE_URL: str = "http://mldataset:8001"
     AUTH_SERVICE_URL: str = "http://auth:8002"
     GATEWAY_TIMEOUT: int = 59
+
+    # how each service is reached: "tcp" (its URL), "uds" (a uvicorn --uds
+    # socket on this host) or "asgi" (its app imported into the gateway
+    # process from the given directory, for co-located deployments; a
+    # mounted auth service hashes passwords in threads, not processes)
+    AUTH_SERVICE_TRANSPORT: Literal["tcp", "uds", "asgi"] = "tcp"
+    MLDATASET_SERVICE_TRANSPORT: Literal["tcp", "uds", "asgi"] = "tcp"
+    AUTH_SERVICE_UDS: Optional[str] = None
+    MLDATASET_SERVICE_UDS: Optional[str] = None
+    AUTH_SERVICE_APP_DIR: str = "../auth"
+    MLDATASET_SERVICE_APP_DIR: str = "../mldatasets"
+
+    # /batch fan-out
+    BATCH_MAX_ITEMS: int = 50
+    BATCH_MAX_CONCURRENCY: int = 10
+
+    # optional replicas behind each service URL, e.g. '["http://auth-1:8002", "http://auth-2:8002"]'
+    AUTH_SERVICE_REPLICAS: List[str] = []
+    MLDATASET_SERVICE_REPLICAS: List[str] = []
+    UPSTREAM_HEALTH_PATH: str = "/health"
+    UPSTREAM_HEALTH_INTERVAL: float = 5.0
+    UPSTREAM_HEALTH_TIMEOUT: float = 1.0
+    UPSTREAM_UNHEALTHY_THRESHOLD: int = 3
+    UPSTREAM_EJECTION_SECONDS: float = 30.0
+    UPSTREAM_SLOW_START_SECONDS: float = 30.0
+
+    # upstream connection pools, one httpx client per service
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_HTTP2: bool = False  # requires the `h2` package
+    UPSTREAM_TIMEOUT: float = 30.0
+    UPSTREAM_CONNECT_TIMEOUT: float = 5.0
+    UPSTREAM_POOL_TIMEOUT: float = 5.0
+
+    # retries for idempotent upstream calls, full-jitter exponential backoff
+    UPSTREAM_RETRIES: int = 2
+    UPSTREAM_RETRY_BACKOFF: float = 0.05
+    UPSTREAM_RETRY_MAX_BACKOFF: float = 1.0
+
+    # admission control: per-client-IP token buckets (0 disables the
+    # gateway-wide limit) and per-upstream concurrency limits with a short wait queue
+    RATE_LIMIT_PER_SECOND: float = 50.0
+    RATE_LIMIT_BURST: int = 100
+    RATE_LIMIT_MAX_CLIENTS: int = 100000
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    UPSTREAM_MAX_CONCURRENCY: int = 100
+    UPSTREAM_MAX_QUEUE: int = 100
+    UPSTREAM_QUEUE_TIMEOUT: float = 0.5
+
+    # hedged requests: at most HEDGE_BUDGET_RATIO of hedgeable requests are
+    # duplicated; percentile-derived delays need HEDGE_MIN_SAMPLES latencies
+    # and are recomputed every HEDGE_PERCENTILE_REFRESH new ones
+    HEDGE_BUDGET_RATIO: float = 0.05
+    HEDGE_BUDGET_BURST: float = 10.0
+    HEDGE_LATENCY_SAMPLES: int = 1000
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_PERCENTILE_REFRESH: int = 50
+
+    # per-upstream circuit breaker
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_WINDOW: float = 30.0
+    CIRCUIT_BREAKER_MIN_CALLS: int = 10
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 15.0
+    CIRCUIT_BREAKER_HALF_OPEN_CALLS: int = 3
+
+    # verified-token cache, 0 disables it
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_TTL: float = 300.0
+
+    # local JWT verification against the auth service's JWKS
+    AUTH_JWKS_PATH: str = "/.well-known/jwks.json"
+    AUTH_JWKS_REFRESH_INTERVAL: float = 300.0
+    AUTH_JWKS_MIN_REFRESH_INTERVAL: float = 10.0
+    JWT_ALGORITHMS: List[str] = ["RS256"]
+    JWT_ISSUER: str = "auth"
+    JWT_LEEWAY: int = 0
+
+    # revoked token ids pulled from the auth service; a Bloom filter answers
+    # the common "not revoked" case without touching the exact set
+    AUTH_REVOCATIONS_PATH: str = "/revocations"
+    REVOCATION_SYNC_INTERVAL: float = 1.0
+    # ids re-requested on every poll, to catch revocations committed out of order
+    REVOCATION_SYNC_OVERLAP: int = 100
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+
+    # latency histograms served at /metrics; Server-Timing exposes the
+    # per-stage breakdown to clients
+    METRICS_BUCKETS: List[float] = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+    SERVER_TIMING_ENABLED: bool = True
+    # event loop lag sentinel; stalls above the threshold log the loop's stack
+    LOOP_MONITOR_ENABLED: bool = False
+    LOOP_MONITOR_INTERVAL: float = 0.1
+    LOOP_MONITOR_THRESHOLD: float = 0.1
+
+    # JSON logs are written by a background thread; DEBUG records (e.g. one
+    # per completed request) are kept for this fraction of request ids
+    LOG_LEVEL: str = "INFO"
+    LOG_DEBUG_SAMPLE_RATE: float = 0.01
+    LOG_QUEUE_SIZE: int = 10000
+
+    # response compression negotiated from Accept-Encoding (br and zstd need
+    # the `brotli`/`zstandard` packages); bodies above the offload size are
+    # compressed in a worker thread
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_OFFLOAD_SIZE: int = 256 * 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_LEVEL: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # response cache for routes declared with cache_ttl; the Redis tier is
+    # shared between gateway replicas and is off unless a URL is given
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_REDIS_URL: Optional[str] = None
 settings = Settings()
\ No newline at end of file
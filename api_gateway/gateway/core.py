@@ -1,12 +1,44 @@
 import httpx
 from fastapi import HTTPException, Request, Response, status, File, UploadFile, Form
-from typing import List, Optional, Dict, Any, Union, Callable
+from typing import List, Optional, Dict, Any, Union, Callable, AsyncIterator, Awaitable, Annotated, get_args, get_origin
 from importlib import import_module
-import base64
-from pydantic import BaseModel
-from contextlib import asynccontextmanager
+import asyncio
+import inspect
+import math
+import time
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from contextlib import asynccontextmanager, nullcontext
 import functools
 from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.background import BackgroundTask
+from fastapi.responses import JSONResponse, StreamingResponse
+from conf.conf import settings
+from exceptions import RouteConfigurationError
+from token_cache import token_cache
+from auth import jwks_cache, revocation_list, revocation_sync
+from admission import AdmissionRejected, Bulkhead, bulkheads, client_id, close_rate_limiters, make_rate_limiter
+from cache import CachedResponse, etag_matches, response_cache
+from singleflight import default_coalesce_key, singleflight
+from resilience import CircuitBreaker, CircuitOpen, RetryPolicy, RETRYABLE_STATUS_CODES, call_upstream, circuit_breakers, default_retry_policy
+from balancer import load_balancer
+from transport import service_transports
+from compression import compress_response, passthrough_body, read_undecoded
+from metrics import StageTimer, current_stages, loop_monitor, metrics
+from loop_monitor import monitored
+from hedging import HedgePolicy
+from logs import request_id_headers
+from deadline import bounded, current_deadline, deadline_headers, expired, remaining, request_deadline
+
+# upstream response headers relayed by streaming routes
+STREAM_FORWARD_HEADERS = (
+    'content-type',
+    'content-length',
+    'content-encoding',
+    'content-disposition',
+    'cache-control',
+    'etag',
+    'last-modified',
+)
 
 
 class APIError(Exception):
@@ -29,59 +61,340 @@ class AuthenticationError(APIError):
         )
 
 class HTTPClient:
+    """Long-lived, pooled ``httpx.AsyncClient`` per upstream base URL.
+
+    Clients are created on application startup for every configured service
+    and closed on shutdown; an unknown upstream gets a client lazily.
+    """
+    _clients: Dict[str, httpx.AsyncClient] = {}
+
     @staticmethod
-    @asynccontextmanager
-    async def get_client():
-        """Context manager for HTTP client"""
-        async with httpx.AsyncClient() as client:
-            yield client
+    def _base_url(url: str) -> str:
+        parsed = httpx.URL(url)
+        port = f':{parsed.port}' if parsed.port else ''
+        return f'{parsed.scheme}://{parsed.host}{port}'
 
     @staticmethod
-    async def make_request(
+    def _build_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY
+        )
+        timeout = httpx.Timeout(
+            settings.UPSTREAM_TIMEOUT,
+            connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+            pool=settings.UPSTREAM_POOL_TIMEOUT
+        )
+        return httpx.AsyncClient(
+            limits=limits,
+            timeout=timeout,
+            http2=settings.UPSTREAM_HTTP2,
+            transport=transport
+        )
+
+    @classmethod
+    async def startup(cls, service_urls: List[str]) -> None:
+        for service_url in service_urls:
+            base_url = cls._base_url(service_url)
+            if base_url not in cls._clients:
+                cls._clients[base_url] = cls._build_client(service_transports.get(base_url))
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        clients, cls._clients = cls._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    @classmethod
+    def get_client(cls, url: str) -> httpx.AsyncClient:
+        """Return the pooled client for the upstream serving ``url``"""
+        base_url = cls._base_url(url)
+        client = cls._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = cls._clients[base_url] = cls._build_client(service_transports.get(base_url))
+        return client
+
+    @classmethod
+    async def dispatch(
+        cls,
+        url: str,
+        attempt: Callable[[httpx.AsyncClient, str], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        """Run one attempt, against a replica when the service has several"""
+        replica_set = load_balancer.replica_set(url)
+        if replica_set is None:
+            return await attempt(cls.get_client(url), url)
+
+        replica = replica_set.pick()
+        target = replica_set.rewrite(url, replica)
+        replica.outstanding += 1
+        try:
+            response = await attempt(cls.get_client(target), target)
+        except httpx.RequestError:
+            replica_set.record(replica, failed=True)
+            raise
+        finally:
+            replica.outstanding -= 1
+        replica_set.record(replica, failed=response.status_code in RETRYABLE_STATUS_CODES)
+        return response
+
+    @classmethod
+    def circuit_breaker(cls, url: str) -> CircuitBreaker:
+        return circuit_breakers.get(cls._base_url(url))
+
+    @classmethod
+    def bulkhead(cls, url: str) -> Bulkhead:
+        return bulkheads.get(cls._base_url(url))
+
+    @staticmethod
+    def _attempt_timeout(timeout: Optional[float]) -> Any:
+        """Per-attempt timeout, capped by the request's remaining deadline"""
+        if remaining() is None:
+            return timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        limit = bounded(timeout if timeout is not None else settings.UPSTREAM_TIMEOUT)
+        return httpx.Timeout(limit, connect=min(limit, settings.UPSTREAM_CONNECT_TIMEOUT))
+
+    @staticmethod
+    def _unavailable_error() -> APIError:
+        if expired():
+            return APIError(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail='Gateway timeout'
+            )
+        return APIError(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Service is unavailable.',
+            headers={'WWW-Authenticate': 'Bearer'}
+        )
+
+    @staticmethod
+    def _circuit_open_error(e: CircuitOpen) -> APIError:
+        return APIError(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Service is unavailable.',
+            headers={'Retry-After': str(max(1, math.ceil(e.retry_after)))}
+        )
+
+    @staticmethod
+    def _status_error(e: httpx.HTTPStatusError) -> APIError:
+        e.response.read()
+        error_detail = (
+            e.response.json().get('detail', str(e))
+            if e.response.headers.get('content-type') == 'application/json'
+            else str(e)
+        )
+        return APIError(
+            status_code=e.response.status_code,
+            detail=error_detail,
+            headers={'WWW-Authenticate': 'Bearer'}
+        )
+
+    @staticmethod
+    async def send_request(
         url: str,
         method: str,
         data: Optional[Dict[str, Any]] = None,
         headers: Optional[Dict[str, str]] = None,
-        timeout: float = 30.0
-    ) -> tuple[Any, int]:
-        """Make HTTP request with error handling"""
+        timeout: Optional[float] = None,
+        content: Optional[Union[bytes, AsyncIterator[bytes]]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: bool = True,
+        bulkhead: bool = True,
+        decode: bool = True
+    ) -> httpx.Response:
+        """Make HTTP request with error handling, returning the unparsed response.
+
+        ``content`` sends a raw request body instead of ``data`` as JSON;
+        streamed bodies (e.g. multipart) are never retried. With ``decode=False`` a compressed body is kept as
+        the upstream sent it and only decoded on ``read()``.
+        """
         headers = headers or {}
         
+        async def attempt(client: httpx.AsyncClient, target: str) -> httpx.Response:
+            request = client.build_request(
+                method=method.upper(),
+                url=target,
+                json=data if content is None else None,
+                content=content,
+                headers={**headers, **deadline_headers(), **request_id_headers()},
+                timeout=HTTPClient._attempt_timeout(timeout)
+            )
+            if not decode:
+                return await read_undecoded(client, request)
+            return await client.send(request)
+
         try:
-            async with HTTPClient.get_client() as client:
-                response = await client.request(
-                    method=method.upper(),
-                    url=url,
-                    json=data,
-                    headers=headers,
-                    timeout=timeout
+            async with HTTPClient.bulkhead(url).slot() if bulkhead else nullcontext():
+                response = await call_upstream(
+                    lambda: HTTPClient.dispatch(url, attempt),
+                    method=method,
+                    breaker=HTTPClient.circuit_breaker(url) if circuit_breaker else None,
+                    retry_policy=retry_policy,
+                    replayable=not isinstance(content, AsyncIterator)
                 )
-                response.raise_for_status()
-                return response.json(), response.status_code
+            response.raise_for_status()
+            return response
                 
         except httpx.HTTPStatusError as e:
-            error_detail = (
-                e.response.json().get('detail', str(e))
-                if e.response.headers.get('content-type') == 'application/json'
-                else str(e)
-            )
+            raise HTTPClient._status_error(e)
+        except CircuitOpen as e:
+            raise HTTPClient._circuit_open_error(e)
+        except AdmissionRejected as e:
+            raise APIError(status_code=e.status_code, detail=e.detail, headers=e.headers)
+        except httpx.RequestError:
+            raise HTTPClient._unavailable_error()
+        except Exception:
             raise APIError(
-                status_code=e.response.status_code,
-                detail=error_detail,
-                headers={'WWW-Authenticate': 'Bearer'}
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='Internal server error'
             )
-        except httpx.RequestError:
+
+    @staticmethod
+    async def make_request(
+        url: str,
+        method: str,
+        data: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        content: Optional[Union[bytes, AsyncIterator[bytes]]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: bool = True,
+        bulkhead: bool = True
+    ) -> tuple[Any, int]:
+        """Make HTTP request and decode the JSON response body"""
+        response = await HTTPClient.send_request(
+            url=url,
+            method=method,
+            data=data,
+            headers=headers,
+            timeout=timeout,
+            content=content,
+            retry_policy=retry_policy,
+            circuit_breaker=circuit_breaker,
+            bulkhead=bulkhead
+        )
+        try:
+            return response.json(), response.status_code
+        except Exception:
             raise APIError(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail='Service is unavailable.',
-                headers={'WWW-Authenticate': 'Bearer'}
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail='Internal server error'
             )
+
+    @staticmethod
+    async def stream_request(
+        url: str,
+        method: str,
+        data: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        content: Optional[Union[bytes, AsyncIterator[bytes]]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: bool = True,
+        bulkhead: bool = True
+    ) -> StreamingResponse:
+        """Make HTTP request and relay the upstream response as a stream.
+
+        Status, the headers in ``STREAM_FORWARD_HEADERS`` and the raw body
+        bytes are passed through without being buffered or decoded. Error
+        responses are read and raised as ``APIError`` like ``make_request``.
+        """
+        headers = headers or {}
+
+        async def attempt(client: httpx.AsyncClient, target: str) -> httpx.Response:
+            return await client.send(
+                client.build_request(
+                    method=method.upper(),
+                    url=target,
+                    json=data if content is None else None,
+                    content=content,
+                    headers={**headers, **deadline_headers(), **request_id_headers()},
+                    timeout=HTTPClient._attempt_timeout(timeout)
+                ),
+                stream=True
+            )
+
+        try:
+            async with HTTPClient.bulkhead(url).slot() if bulkhead else nullcontext():
+                response = await call_upstream(
+                    lambda: HTTPClient.dispatch(url, attempt),
+                    method=method,
+                    breaker=HTTPClient.circuit_breaker(url) if circuit_breaker else None,
+                    retry_policy=retry_policy,
+                    replayable=not isinstance(content, AsyncIterator)
+                )
+        except CircuitOpen as e:
+            raise HTTPClient._circuit_open_error(e)
+        except AdmissionRejected as e:
+            raise APIError(status_code=e.status_code, detail=e.detail, headers=e.headers)
+        except httpx.RequestError:
+            raise HTTPClient._unavailable_error()
         except Exception:
             raise APIError(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail='Internal server error'
             )
 
+        if response.is_error:
+            try:
+                await response.aread()
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                raise HTTPClient._status_error(e)
+            finally:
+                await response.aclose()
+
+        async def relay() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await response.aclose()
+
+        return StreamingResponse(
+            relay(),
+            status_code=response.status_code,
+            headers={
+                name: response.headers[name]
+                for name in STREAM_FORWARD_HEADERS
+                if name in response.headers
+            },
+            background=BackgroundTask(response.aclose)
+        )
+
+async def api_error_handler(request: Request, exc: APIError) -> JSONResponse:
+    return JSONResponse(
+        {'detail': exc.detail},
+        status_code=exc.status_code,
+        headers=exc.headers
+    )
+
+@asynccontextmanager
+async def lifespan(app):
+    """Application lifespan: upstream pools and the gateway's background tasks"""
+    await service_transports.start()
+    await HTTPClient.startup([
+        settings.AUTH_SERVICE_URL,
+        settings.MLDATASET_SERVICE_URL,
+        *load_balancer.replica_urls()
+    ])
+    jwks_cache.start(lambda url: HTTPClient.dispatch(url, lambda client, target: client.get(target)))
+    revocation_sync.start(lambda url: HTTPClient.dispatch(url, lambda client, target: client.get(target)))
+    load_balancer.start(HTTPClient.get_client)
+    await response_cache.start()
+    try:
+        async with monitored(loop_monitor):
+            yield
+    finally:
+        await response_cache.stop()
+        await load_balancer.stop()
+        await revocation_sync.stop()
+        await jwks_cache.stop()
+        await close_rate_limiters()
+        await HTTPClient.shutdown()
+        await service_transports.stop()
+
 class ModuleImporter:
     @staticmethod
     def import_function(method_path: str) -> Callable:
@@ -95,6 +408,159 @@ class ModuleImporter:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class Hook:
+    """An auth hook resolved from its dotted path when the route is registered"""
+    __slots__ = ('path', 'func', 'is_async')
+
+    def __init__(self, path: str):
+        try:
+            func = ModuleImporter.import_function(path)
+        except APIError as e:
+            raise RouteConfigurationError(e.detail) from None
+        if not callable(func):
+            raise RouteConfigurationError(f"Hook is not callable: {path}")
+        self.path = path
+        self.func = func
+        self.is_async = inspect.iscoroutinefunction(func)
+
+    async def __call__(self, *args: Any) -> Any:
+        if self.is_async:
+            return await self.func(*args)
+        return self.func(*args)
+
+class RouteSpec:
+    """
+    Everything a proxied route needs at request time, resolved once by
+    ``route()`` so misconfigured hooks or response models fail at boot.
+    """
+    __slots__ = (
+        'path',
+        'service_url',
+        'payload_key',
+        'authentication_required',
+        'token_decoder',
+        'authorization_checker',
+        'header_generator',
+        'response_model',
+        'response_adapter',
+        'form_data',
+        'raw_body',
+        'stream_response',
+        'retry_policy',
+        'circuit_breaker',
+        'coalesce_key',
+        'cache_ttl',
+        'vary_on',
+        'invalidates',
+        'rate_limiter',
+        'bulkhead',
+        'hedge',
+        'hedge_service_url',
+        'timeout',
+        'metrics',
+    )
+
+    def __init__(
+        self,
+        path: str,
+        service_url: str,
+        payload_key: str,
+        authentication_required: bool,
+        authentication_token_decoder: Optional[str],
+        service_authorization_checker: Optional[str],
+        service_header_generator: Optional[str],
+        response_model: Optional[str],
+        response_list: bool,
+        form_data: bool,
+        stream_response: bool,
+        raw_body: bool = False,
+        retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        circuit_breaker: bool = True,
+        coalesce: bool = False,
+        coalesce_key: Optional[str] = None,
+        cache_ttl: Optional[float] = None,
+        vary_on: Optional[List[str]] = None,
+        invalidates: Optional[List[str]] = None,
+        rate_limit: Optional[float] = None,
+        rate_burst: Optional[int] = None,
+        bulkhead: bool = True,
+        hedge_after_ms: Optional[float] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_service_url: Optional[str] = None,
+        timeout: Optional[float] = None
+    ):
+        self.path = path
+        self.service_url = service_url
+        self.payload_key = payload_key
+        self.authentication_required = authentication_required
+        self.form_data = form_data
+        self.raw_body = raw_body
+        self.stream_response = stream_response
+        if raw_body and form_data:
+            raise RouteConfigurationError(f"{path}: form_data already forwards the body raw")
+        self.timeout = settings.GATEWAY_TIMEOUT if timeout is None else timeout
+        self.metrics = metrics.route(path, HTTPClient._base_url(service_url))
+        self.circuit_breaker = circuit_breaker
+        self.bulkhead = bulkhead
+        self.rate_limiter = None
+        if rate_limit:
+            self.rate_limiter = make_rate_limiter(
+                rate=rate_limit,
+                burst=rate_burst or max(1, math.ceil(rate_limit)),
+                namespace=path
+            )
+        if retries is None and retry_backoff is None:
+            self.retry_policy = default_retry_policy
+        else:
+            self.retry_policy = RetryPolicy(
+                retries=default_retry_policy.retries if retries is None else retries,
+                backoff=default_retry_policy.backoff if retry_backoff is None else retry_backoff,
+                max_backoff=default_retry_policy.max_backoff
+            )
+
+        self.token_decoder = self.authorization_checker = self.header_generator = None
+        if authentication_required:
+            if not authentication_token_decoder:
+                raise RouteConfigurationError(f"{path}: authentication requires a token decoder")
+            self.token_decoder = Hook(authentication_token_decoder)
+            if service_authorization_checker:
+                self.authorization_checker = Hook(service_authorization_checker)
+            if service_header_generator:
+                self.header_generator = Hook(service_header_generator)
+
+        self.coalesce_key = None
+        if coalesce:
+            if form_data or stream_response:
+                raise RouteConfigurationError(f"{path}: streamed routes cannot be coalesced")
+            self.coalesce_key = Hook(coalesce_key).func if coalesce_key else default_coalesce_key
+
+        self.hedge = None
+        self.hedge_service_url = hedge_service_url
+        if hedge_after_ms is not None:
+            if form_data or stream_response:
+                raise RouteConfigurationError(f"{path}: streamed routes cannot be hedged")
+            self.hedge = HedgePolicy(hedge_after_ms, hedge_percentile)
+
+        self.cache_ttl = cache_ttl
+        self.vary_on = tuple(header.lower() for header in (vary_on if vary_on is not None else ['authorization']))
+        self.invalidates = tuple(invalidates or ())
+        if cache_ttl:
+            if form_data or stream_response:
+                raise RouteConfigurationError(f"{path}: streamed routes cannot be cached")
+            response_cache.enabled = True
+
+        self.response_model = self.response_adapter = None
+        if response_model:
+            try:
+                model = ModuleImporter.import_function(response_model)
+                self.response_model = List[model] if response_list else model
+                self.response_adapter = TypeAdapter(self.response_model)
+            except Exception:
+                raise RouteConfigurationError(
+                    f"{path}: invalid response model {response_model}"
+                ) from None
+
 def route(
     request_method: Any,
     path: str,
@@ -107,74 +573,279 @@ def route(
     service_header_generator: str = 'auth.generate_request_header',
     response_model: Optional[str] = None,
     response_list: bool = False,
-    form_data: bool = False
+    form_data: bool = False,
+    stream_response: bool = False,
+    raw_body: bool = False,
+    retries: Optional[int] = None,
+    retry_backoff: Optional[float] = None,
+    circuit_breaker: bool = True,
+    coalesce: bool = False,
+    coalesce_key: Optional[str] = None,
+    cache_ttl: Optional[float] = None,
+    vary_on: Optional[List[str]] = None,
+    invalidates: Optional[List[str]] = None,
+    rate_limit: Optional[float] = None,
+    rate_burst: Optional[int] = None,
+    bulkhead: bool = True,
+    hedge_after_ms: Optional[float] = None,
+    hedge_percentile: Optional[float] = None,
+    hedge_service_url: Optional[str] = None,
+    timeout: Optional[float] = None
 ):
-
-    
-    if response_model:
-        try:
-            response_model_class = ModuleImporter.import_function(response_model)
-            if response_list:
-                response_model_class = List[response_model_class]
-        except Exception:
-            raise RequestError(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-    else:
-        response_model_class = None
-
-    real_link = request_method(
-        path,
-        response_model=response_model_class,
-        status_code=status_code
+    spec = RouteSpec(
+        path=path,
+        service_url=service_url,
+        payload_key=payload_key,
+        authentication_required=authentication_required,
+        authentication_token_decoder=authentication_token_decoder,
+        service_authorization_checker=service_authorization_checker,
+        service_header_generator=service_header_generator,
+        response_model=response_model,
+        response_list=response_list,
+        form_data=form_data,
+        stream_response=stream_response,
+        raw_body=raw_body,
+        retries=retries,
+        retry_backoff=retry_backoff,
+        circuit_breaker=circuit_breaker,
+        coalesce=coalesce,
+        coalesce_key=coalesce_key,
+        cache_ttl=cache_ttl,
+        vary_on=vary_on,
+        invalidates=invalidates,
+        rate_limit=rate_limit,
+        rate_burst=rate_burst,
+        bulkhead=bulkhead,
+        hedge_after_ms=hedge_after_ms,
+        hedge_percentile=hedge_percentile,
+        hedge_service_url=hedge_service_url,
+        timeout=timeout
     )
 
     def wrapper(func):
-        @real_link
+        openapi_extra = None
+        if spec.form_data:
+            openapi_extra = multipart_openapi_body(func)
+        elif spec.raw_body:
+            openapi_extra = json_openapi_body(func, payload_key)
+        real_link = request_method(
+            path,
+            response_model=spec.response_model,
+            status_code=status_code,
+            openapi_extra=openapi_extra
+        )
+
         @functools.wraps(func)
         async def inner(request: Request, response: Response, **kwargs):
-            service_headers = {}
-
-            if authentication_required:
-                await handle_authentication(
-                    request,
-                    authentication_token_decoder,
-                    service_authorization_checker,
-                    service_header_generator,
-                    service_headers
-                )
-
+            stages = StageTimer()
+            stages_token = current_stages.set(stages)
+            token = current_deadline.set(request_deadline(request, spec.timeout))
+            status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
             try:
-                method = request.method.lower()
-                url = f'{service_url}{request.url.path}'
-                payload = await process_payload(payload_key, kwargs, form_data)
-           
-                resp_data, status_code_from_service = await HTTPClient.make_request(
-                    url=url,
-                    method=method,
-                    data=payload,
-                    headers=service_headers,
-                )
-                response.status_code = status_code_from_service
-                return resp_data
-
-            except APIError:
-                raise
-            except Exception:
+                async with asyncio.timeout(remaining()):
+                    result = await proxy_request(spec, request, kwargs)
+                    started = time.perf_counter()
+                    result = await compress_response(result, request.headers.get('accept-encoding'))
+                    stages.encode += time.perf_counter() - started
+                status_code = result.status_code
+                if settings.SERVER_TIMING_ENABLED:
+                    result.headers['server-timing'] = stages.server_timing(time.perf_counter() - stages.started)
+                return result
+            except TimeoutError:
+                status_code = status.HTTP_504_GATEWAY_TIMEOUT
+                spec.metrics.error(status_code)
                 raise APIError(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Internal server error"
+                    status_code=status_code,
+                    detail='Gateway timeout'
                 )
+            except APIError as e:
+                status_code = e.status_code
+                spec.metrics.error(status_code)
+                raise
+            finally:
+                spec.metrics.observe(stages, time.perf_counter() - stages.started, status_code)
+                current_deadline.reset(token)
+                current_stages.reset(stages_token)
+
+        if spec.form_data or spec.raw_body:
+            # keep FastAPI from parsing the body; it is forwarded as-is
+            inner.__signature__ = inspect.Signature([
+                inspect.Parameter('request', inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=Request),
+                inspect.Parameter('response', inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=Response),
+            ])
 
-        return inner
+        inner.route_spec = spec
+        return real_link(inner)
     return wrapper
 
+def forward(
+    router: Any,
+    prefix: str,
+    service_url: str,
+    methods: Optional[List[str]] = None,
+    include_in_schema: bool = True,
+    **options: Any
+) -> None:
+    """
+    Proxy every path under ``prefix`` to ``service_url`` without a handler
+    stub per endpoint. Bodies are forwarded raw and validated upstream;
+    ``options`` are those of ``route()``.
+    """
+    methods = methods or ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+    prefix = prefix.rstrip('/')
+
+    # one route per method keeps OpenAPI operation ids unique
+    for method in methods:
+        async def forwarded(request: Request, response: Response):
+            pass
+        forwarded.__name__ = f'forward{prefix.replace("/", "_")}_{method.lower()}'
+
+        route(
+            request_method=functools.partial(
+                router.api_route,
+                methods=[method],
+                include_in_schema=include_in_schema
+            ),
+            path=prefix + '/{path:path}',
+            status_code=status.HTTP_200_OK,
+            payload_key=None,
+            service_url=service_url,
+            raw_body=True,
+            **options
+        )(forwarded)
+
+async def proxy_request(
+    spec: RouteSpec,
+    request: Request,
+    kwargs: Dict[str, Any],
+    auth_memo: Optional[Dict[Any, Any]] = None
+) -> Response:
+    """
+    Forward one incoming request through the route's pipeline.
+    ``auth_memo`` shares verified tokens between the items of a batch.
+    """
+    service_headers = {}
+    stages = current_stages.get() or StageTimer()
+
+    if spec.rate_limiter:
+        retry_after = await spec.rate_limiter.acquire(client_id(request))
+        if retry_after is not None:
+            rejected = AdmissionRejected(status.HTTP_429_TOO_MANY_REQUESTS, 'Too many requests.', retry_after)
+            raise APIError(status_code=rejected.status_code, detail=rejected.detail, headers=rejected.headers)
+
+    if spec.authentication_required:
+        started = time.perf_counter()
+        await handle_authentication(request, spec, service_headers, auth_memo)
+        stages.auth += time.perf_counter() - started
+
+    try:
+        method = request.method.lower()
+        url = f'{spec.service_url}{request.url.path}'
+        if request.url.query:
+            url = f'{url}?{request.url.query}'
+
+        cache_variant = None
+        if spec.cache_ttl and method in ('get', 'head'):
+            cache_variant = response_cache.variant(request, spec.vary_on)
+            cached = await response_cache.get(request.url.path, cache_variant)
+            if cached is not None:
+                if etag_matches(request.headers.get('if-none-match'), cached.etag):
+                    return cached.not_modified()
+                return cached.to_response()
+
+        started = time.perf_counter()
+        if spec.form_data:
+            # pass the multipart body through chunk by chunk
+            service_headers.update(stream_body_headers(request))
+            request_body = {'content': request.stream()}
+        elif spec.raw_body:
+            # forward the client's bytes unparsed; the upstream validates them
+            body = await request.body()
+            if body:
+                service_headers['content-type'] = request.headers.get('content-type', 'application/json')
+            request_body = {'content': body}
+        else:
+            request_body = {'data': await process_payload(spec.payload_key, kwargs)}
+        stages.payload += time.perf_counter() - started
+
+        started = time.perf_counter()
+        if spec.stream_response:
+            # the body is relayed undecoded, so let the upstream pick a
+            # coding the client itself accepts
+            streamed = await HTTPClient.stream_request(
+                url=url,
+                method=method,
+                headers={
+                    **service_headers,
+                    'Accept-Encoding': request.headers.get('accept-encoding', 'identity')
+                },
+                retry_policy=spec.retry_policy,
+                circuit_breaker=spec.circuit_breaker,
+                bulkhead=spec.bulkhead,
+                **request_body
+            )
+            stages.upstream += time.perf_counter() - started
+            await invalidate_cached(request, spec)
+            return streamed
+
+        send = functools.partial(
+            HTTPClient.send_request,
+            url=url,
+            method=method,
+            headers=service_headers,
+            retry_policy=spec.retry_policy,
+            circuit_breaker=spec.circuit_breaker,
+            bulkhead=spec.bulkhead,
+            # raw passthrough routes may relay a compressed upstream body as-is
+            decode=spec.response_adapter is not None or cache_variant is not None,
+            **request_body
+        )
+        if spec.hedge and method in ('get', 'head'):
+            # duplicate slow attempts, to an alternate upstream if configured
+            alternate = send
+            if spec.hedge_service_url:
+                alternate = functools.partial(
+                    send,
+                    url=url.replace(spec.service_url, spec.hedge_service_url, 1)
+                )
+            send = functools.partial(spec.hedge.run, send, alternate)
+
+        if spec.coalesce_key and method in ('get', 'head'):
+            # identical concurrent GETs share one upstream call
+            key = (method, url, spec.coalesce_key(request, service_headers))
+            upstream = await singleflight.do(key, send)
+        else:
+            upstream = await send()
+        stages.upstream += time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = encode_response(upstream, spec.response_adapter, request.headers.get('accept-encoding'))
+
+        if cache_variant is not None and result.status_code == status.HTTP_200_OK:
+            entry = CachedResponse.from_response(result, spec.cache_ttl)
+            await response_cache.set(request.url.path, cache_variant, entry, spec.cache_ttl)
+            stages.encode += time.perf_counter() - started
+            if etag_matches(request.headers.get('if-none-match'), entry.etag):
+                return entry.not_modified()
+            return entry.to_response()
+
+        stages.encode += time.perf_counter() - started
+        await invalidate_cached(request, spec)
+        return result
+
+    except APIError:
+        raise
+    except Exception:
+        raise APIError(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
 async def handle_authentication(
     request: Request,
-    token_decoder_path: str,
-    auth_checker_path: str,
-    header_generator_path: str,
-    service_headers: Dict[str, str]
+    spec: RouteSpec,
+    service_headers: Dict[str, str],
+    auth_memo: Optional[Dict[Any, Any]] = None
 ) -> None:
 
     authorization = request.headers.get('authorization')
@@ -182,42 +853,110 @@ async def handle_authentication(
         raise AuthenticationError("Authorization header missing")
 
     try:
-        token_decoder = ModuleImporter.import_function(token_decoder_path)
-        token_payload = token_decoder(authorization)
+        cache_key = token_cache.key(
+            authorization,
+            spec.token_decoder.path,
+            spec.header_generator.path if spec.header_generator else None
+        )
+        cached = auth_memo.get(cache_key) if auth_memo is not None else None
+        if cached is None:
+            cached = token_cache.get(cache_key)
+        if cached is None:
+            token_payload = await spec.token_decoder(authorization)
+            generated_headers = None
+        else:
+            token_payload, generated_headers = cached
 
-        if auth_checker_path:
-            authorization_check = ModuleImporter.import_function(auth_checker_path)
-            if not authorization_check(token_payload):
+        # checked on every request, cached tokens included
+        if isinstance(token_payload, dict) and revocation_list.is_revoked(token_payload.get('jti')):
+            raise AuthenticationError("Token has been revoked")
+
+        if spec.authorization_checker:
+            if not await spec.authorization_checker(token_payload):
                 raise AuthenticationError(
-                    
+                    "Not enough permissions",
                     status_code=status.HTTP_403_FORBIDDEN
                 )
 
-        if header_generator_path:
-            header_generator = ModuleImporter.import_function(header_generator_path)
-            service_headers.update(header_generator(token_payload))
+        if generated_headers is None:
+            generated_headers = (
+                await spec.header_generator(token_payload)
+                if spec.header_generator
+                else {}
+            )
+            token_cache.set(cache_key, token_payload, generated_headers)
+
+        if auth_memo is not None:
+            auth_memo[cache_key] = (token_payload, generated_headers)
+        service_headers.update(generated_headers)
 
     except APIError:
         raise
     except Exception as e:
         raise AuthenticationError(str(e))
 
-async def process_payload(payload_key: str, kwargs: Dict[str, Any], form_data: bool = False) -> Optional[Any]:
+async def invalidate_cached(request: Request, spec: RouteSpec) -> None:
+    """A successful mutation drops cached responses for its path and ``invalidates``"""
+    if response_cache.enabled and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        await response_cache.invalidate((request.url.path, *spec.invalidates))
+
+def encode_response(
+    upstream: httpx.Response,
+    response_adapter: Optional[TypeAdapter] = None,
+    accept_encoding: Optional[str] = None
+) -> Response:
+    """
+    Build the gateway response from an upstream response.
+
+    Without a response model the upstream bytes are returned verbatim with
+    their content-type, still compressed if the client accepts the
+    upstream's coding. With one, the body is validated by the route's
+    cached ``TypeAdapter`` and serialized straight back to JSON bytes,
+    bypassing FastAPI's ``jsonable_encoder``.
+    """
+    if response_adapter is None:
+        raw = passthrough_body(upstream, accept_encoding)
+        if raw is not None:
+            return Response(
+                content=raw,
+                status_code=upstream.status_code,
+                media_type=upstream.headers.get('content-type'),
+                headers={
+                    'Content-Encoding': upstream.headers['content-encoding'],
+                    'Vary': 'Accept-Encoding'
+                }
+            )
+
+    upstream.read()
+    if response_adapter is None:
+        return Response(
+            content=upstream.content,
+            status_code=upstream.status_code,
+            media_type=upstream.headers.get('content-type')
+        )
+
+    try:
+        content = response_adapter.dump_json(response_adapter.validate_json(upstream.content))
+    except ValidationError:
+        raise APIError(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail='Invalid response from upstream service'
+        )
+    return Response(
+        content=content,
+        status_code=upstream.status_code,
+        media_type='application/json'
+    )
+
+async def process_payload(payload_key: str, kwargs: Dict[str, Any]) -> Optional[Any]:
     try:
         if not kwargs:
-            return {} if form_data else None
+            return None
             
         payload_obj = kwargs.get(payload_key)
         
         if not payload_obj:
-            if form_data:
-                return await process_form_data(kwargs)
             return kwargs
-
-        if form_data:
-            if isinstance(payload_obj, dict):
-                return await process_form_data(payload_obj)
-            return await process_form_data(kwargs)
         
         return (
             payload_obj.model_dump() 
@@ -226,84 +965,66 @@ async def process_payload(payload_key: str, kwargs: Dict[str, Any], form_data: b
         )
         
     except Exception as e:
-        # If there's an error in processing, return empty dict for form data
-        if form_data:
-            return {}
         raise APIError(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error processing payload: {str(e)}"
         )
-async def process_form_data(data: Dict) -> Dict:
+
+def stream_body_headers(request: Request) -> Dict[str, str]:
+    """Headers describing a request body that is forwarded unparsed"""
+    headers = {'content-type': request.headers.get('content-type', 'application/octet-stream')}
+    if 'content-length' in request.headers:
+        headers['content-length'] = request.headers['content-length']
+    return headers
+
+def json_openapi_body(func: Callable, payload_key: Optional[str]) -> Optional[Dict[str, Any]]:
     """
-    Process form data including files, handling empty cases and string inputs.
-    
-    Args:
-        data (Dict): The input form data dictionary
-        
-    Returns:
-        Dict: Processed form data with encoded files and handled empty cases
+    Build the OpenAPI JSON request body from the model a raw_body route
+    declares for ``payload_key``, which is documented but not parsed.
     """
-    if not data:
-        return {}
-        
-    processed_data = {}
-    for key, value in data.items():
-        # Handle list inputs
-        if isinstance(value, list):
-            processed_data[key] = []
-            
-            # Empty list case
-            if not value:
-                continue
-                
-            # Check if list contains files
-            if any(isinstance(f, (UploadFile, StarletteUploadFile)) for f in value):
-                for file in value:
-                    if not isinstance(file, (UploadFile, StarletteUploadFile)):
-                        # Skip non-file items in the list
-                        continue
-                        
-                    try:
-                        file_content = await file.read()
-                        await file.seek(0)
-                        processed_data[key].append({
-                            'filename': file.filename,
-                            'content': base64.b64encode(file_content).decode('utf-8'),
-                            'content_type': file.content_type or 'application/octet-stream'
-                        })
-                    except Exception as e:
-                        continue
-            else:
-                # If no files in list, keep original values
-                processed_data[key] = value
-                
-        # Handle single file case
-        elif isinstance(value, (UploadFile, StarletteUploadFile)):
-            try:
-                file_content = await value.read()
-                await value.seek(0)
-                processed_data[key] = {
-                    'filename': value.filename,
-                    'content': base64.b64encode(file_content).decode('utf-8'),
-                    'content_type': value.content_type or 'application/octet-stream'
-                }
-            except Exception as e:
-                processed_data[key] = None
-                
-        # Handle string or other non-file inputs
-        elif isinstance(value, str):
-            processed_data[key] = value
-            
-        # Handle empty value
-        elif value is None:
-            processed_data[key] = None
-            
-        # Handle Pydantic models
-        elif isinstance(value, BaseModel):
-            processed_data[key] = value.model_dump()
-            
-        # Handle all other cases
+    param = inspect.signature(func).parameters.get(payload_key) if payload_key else None
+    if param is None or not (inspect.isclass(param.annotation) and issubclass(param.annotation, BaseModel)):
+        return None
+    return {
+        'requestBody': {
+            'required': param.default is inspect.Parameter.empty,
+            'content': {
+                'application/json': {'schema': param.annotation.model_json_schema()}
+            }
+        }
+    }
+
+def multipart_openapi_body(func: Callable) -> Dict[str, Any]:
+    """
+    Build the OpenAPI multipart request body from the form/file parameters
+    declared on a form_data route, which are not parsed by the gateway.
+    """
+    properties, required = {}, []
+    for name, param in inspect.signature(func).parameters.items():
+        annotation = param.annotation
+        if get_origin(annotation) is Annotated:
+            annotation = get_args(annotation)[0]
+        if annotation in (Request, Response):
+            continue
+
+        if annotation in (UploadFile, StarletteUploadFile):
+            schema = {'type': 'string', 'format': 'binary'}
+        elif get_origin(annotation) is list and get_args(annotation)[0] in (UploadFile, StarletteUploadFile):
+            schema = {'type': 'array', 'items': {'type': 'string', 'format': 'binary'}}
         else:
-            processed_data[key] = value
-            
-    return processed_data
\ No newline at end of file
+            schema = {'type': 'string'}
+
+        properties[name] = schema
+        if param.default is inspect.Parameter.empty:
+            required.append(name)
+
+    return {
+        'requestBody': {
+            'required': True,
+            'content': {
+                'multipart/form-data': {
+                    'schema': {'type': 'object', 'properties': properties, 'required': required}
+                }
+            }
+        }
+    }
@@ -0,0 +1,48 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import Request
+
+# remaining budget of a request in milliseconds, sent to and honored by upstreams
+DEADLINE_HEADER = 'x-request-deadline-ms'
+
+current_deadline: ContextVar[Optional[float]] = ContextVar('current_deadline', default=None)
+
+
+def request_deadline(request: Request, timeout: float) -> float:
+    """Monotonic deadline for a request: the route timeout, or a shorter budget sent by the caller"""
+    budget = timeout
+    incoming = request.headers.get(DEADLINE_HEADER)
+    if incoming:
+        try:
+            budget = min(budget, int(incoming) / 1000)
+        except ValueError:
+            pass
+    return time.monotonic() + budget
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, None without one"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def bounded(timeout: float) -> float:
+    """``timeout`` capped by the remaining budget"""
+    left = remaining()
+    return timeout if left is None else max(0.0, min(timeout, left))
+
+
+def deadline_headers() -> Dict[str, str]:
+    left = remaining()
+    if left is None:
+        return {}
+    return {DEADLINE_HEADER: str(max(0, int(left * 1000)))}
@@ -7,4 +7,7 @@ class AuthTokenExpired(Exception):
 
 
 class AuthTokenCorrupted(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class RouteConfigurationError(Exception):
+    pass
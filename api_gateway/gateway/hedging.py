@@ -0,0 +1,120 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from conf.conf import settings
+
+
+class LatencyTracker:
+    """
+    Latencies of the last ``size`` upstream calls of a route, in seconds.
+    A percentile is recomputed only after ``refresh_every`` more records,
+    so the request path does not sort the whole buffer every time.
+    """
+    __slots__ = ('size', 'refresh_every', 'samples', 'index', 'count', 'recorded', '_cached', '_cached_at')
+
+    def __init__(self, size: int, refresh_every: int = 1):
+        self.size = size
+        self.refresh_every = max(1, refresh_every)
+        self.samples = [0.0] * size
+        self.index = 0
+        self.count = 0
+        self.recorded = 0
+        self._cached: Optional[Tuple[float, float]] = None
+        self._cached_at = 0
+
+    def record(self, latency: float) -> None:
+        self.samples[self.index] = latency
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        self.recorded += 1
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        if self.count < settings.HEDGE_MIN_SAMPLES:
+            return None
+        cached = self._cached
+        if cached is not None and cached[0] == percentile and self.recorded - self._cached_at < self.refresh_every:
+            return cached[1]
+        ordered = sorted(self.samples[:self.count])
+        value = ordered[min(self.count - 1, int(self.count * percentile / 100))]
+        self._cached, self._cached_at = (percentile, value), self.recorded
+        return value
+
+
+class HedgeBudget:
+    """
+    Caps hedges at ``ratio`` of all hedgeable requests: each request earns
+    ``ratio`` of a token (up to ``burst``), each hedge spends one.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self.requests = 0
+        self.hedged = 0
+
+    def deposit(self) -> None:
+        self.requests += 1
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.hedged += 1
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        return {'requests': self.requests, 'hedged': self.hedged, 'tokens': self.tokens}
+
+
+hedge_budget = HedgeBudget(settings.HEDGE_BUDGET_RATIO, settings.HEDGE_BUDGET_BURST)
+
+
+class HedgePolicy:
+    __slots__ = ('after', 'percentile', 'latency')
+
+    def __init__(self, after_ms: float, percentile: Optional[float] = None):
+        self.after = after_ms / 1000
+        self.percentile = percentile
+        self.latency = LatencyTracker(settings.HEDGE_LATENCY_SAMPLES, settings.HEDGE_PERCENTILE_REFRESH)
+
+    def delay(self) -> float:
+        if self.percentile is None:
+            return self.after
+        observed = self.latency.percentile(self.percentile)
+        return self.after if observed is None else observed
+
+    async def run(
+        self,
+        primary: Callable[[], Awaitable[Any]],
+        alternate: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Start ``primary``; if it has not finished after ``delay()`` and the
+        global budget allows, also start ``alternate``. The first attempt to
+        succeed wins and the other is cancelled; if one fails the other is
+        still awaited.
+        """
+        hedge_budget.deposit()
+        started = time.monotonic()
+        attempts = [asyncio.ensure_future(primary())]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=self.delay())
+            if not done and hedge_budget.try_spend():
+                attempts.append(asyncio.ensure_future(alternate()))
+
+            pending, error = set(attempts), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.latency.record(time.monotonic() - started)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
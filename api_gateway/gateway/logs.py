@@ -0,0 +1,226 @@
+"""
+Structured JSON logging that keeps I/O off the event loop.
+
+``setup_logging`` routes the root logger through a ``QueueHandler``: the
+logging call only stamps the record with the current request id and
+enqueues it, and a ``QueueListener`` thread formats each record as one
+JSON line and writes it. When the queue is full records are dropped and
+counted rather than blocking the caller. DEBUG records are sampled per
+request id, so a sampled request keeps all of its debug lines.
+
+``RequestIdMiddleware`` takes the caller's ``X-Request-Id`` (or makes
+one), exposes it through ``current_request_id`` and echoes it on the
+response; the gateway forwards it to the upstreams with
+``request_id_headers()``.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+REQUEST_ID_HEADER = 'x-request-id'
+_REQUEST_ID_HEADER = REQUEST_ID_HEADER.encode()
+MAX_REQUEST_ID_LENGTH = 128
+
+# libraries that log every call they make; only their warnings are kept
+QUIET_LOGGERS = ('httpx', 'httpcore', 'aiosqlite', 'asyncio')
+
+current_request_id: ContextVar[Optional[str]] = ContextVar('current_request_id', default=None)
+
+logger = logging.getLogger(__name__)
+
+# attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id', 'service'}
+
+
+def request_id_headers() -> Dict[str, str]:
+    request_id = current_request_id.get()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'service': self.service,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Keep ``rate`` of DEBUG records, deciding once per request id"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.threshold = int(max(0.0, min(1.0, rate)) * 0xFFFFFFFF)
+        self._counter = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.threshold >= 0xFFFFFFFF:
+            return True
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            key = request_id.encode()
+        else:
+            self._counter += 1
+            key = self._counter.to_bytes(8, 'little')
+        return zlib.crc32(key) < self.threshold
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # stamped before the filters run, so the sampler can see it too
+        record.request_id = current_request_id.get()
+        return super().handle(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # format the message and traceback here, while args and the
+        # exception are still alive; ``extra`` fields are kept as they are
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    def __init__(self):
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def setup(self, service: str, level: str = 'INFO', debug_sample_rate: float = 0.01, queue_size: int = 10000) -> None:
+        if self.listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter(service))
+        self.handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+        self.handler.addFilter(DebugSampler(debug_sample_rate))
+        self.listener = logging.handlers.QueueListener(self.handler.queue, output, respect_handler_level=True)
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(level.upper())
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Flush what is queued and stop the writer thread"""
+        if self.listener is not None:
+            listener, self.listener = self.listener, None
+            listener.stop()
+
+    def stats(self) -> Dict[str, int]:
+        if self.handler is None:
+            return {'queued': 0, 'dropped': 0}
+        return {'queued': self.handler.queue.qsize(), 'dropped': self.handler.dropped}
+
+
+log_pipeline = LogPipeline()
+
+setup_logging = log_pipeline.setup
+
+
+def _valid_request_id(value: bytes) -> Optional[str]:
+    if not value or len(value) > MAX_REQUEST_ID_LENGTH:
+        return None
+    try:
+        request_id = value.decode('ascii')
+    except UnicodeDecodeError:
+        return None
+    return request_id if request_id.isprintable() else None
+
+
+class RequestIdMiddleware:
+    """
+    Bind the request id for the duration of a request and return it in the
+    ``X-Request-Id`` response header. Completed requests are logged at
+    DEBUG, so they are subject to sampling.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope['headers']:
+            if name == _REQUEST_ID_HEADER:
+                request_id = _valid_request_id(value)
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+        encoded = request_id.encode('ascii')
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                message['headers'] = [
+                    *(header for header in message.get('headers', []) if header[0] != _REQUEST_ID_HEADER),
+                    (_REQUEST_ID_HEADER, encoded),
+                ]
+            await send(message)
+
+        token = current_request_id.set(request_id)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    'request completed',
+                    extra={
+                        'method': scope['method'],
+                        'path': scope['path'],
+                        'status': status_code,
+                        'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                    }
+                )
+            current_request_id.reset(token)
@@ -1,12 +1,24 @@
 from fastapi import FastAPI, status, Request, Response,UploadFile,File,Form
+from fastapi.responses import PlainTextResponse
 from typing import Tuple,List
 from schema.mldataset import Formdata
 from conf.conf import settings
-from core import route
+from core import route, lifespan, APIError, api_error_handler
+from admission import AdmissionMiddleware
+from logs import RequestIdMiddleware, setup_logging
+from batch import run_batch
+from metrics import CONTENT_TYPE, metrics
+from schema.batch import BatchRequest
 from schema.auth import UpdateSchema,LoginSchema,DeleteSchema,RegisterSchema
 from  typing import Annotated
 
-app = FastAPI()
+setup_logging('gateway', settings.LOG_LEVEL, settings.LOG_DEBUG_SAMPLE_RATE, settings.LOG_QUEUE_SIZE)
+
+app = FastAPI(lifespan=lifespan)
+app.add_exception_handler(APIError, api_error_handler)
+app.add_middleware(AdmissionMiddleware)
+# outermost, so rejected and shed requests are tagged too
+app.add_middleware(RequestIdMiddleware)
 @route(
     request_method=app.post,
     path='/login',
@@ -14,7 +26,8 @@ app = FastAPI()
     service_url=settings.AUTH_SERVICE_URL,
     payload_key="login_data",
     authentication_required=False,
-    response_model=''
+    response_model='',
+    raw_body=True
 )
 async def login(login_data:LoginSchema,request: Request, response: Response):
     pass
@@ -26,7 +39,8 @@ async def login(login_data:LoginSchema,request: Request, response: Response):
     service_url=settings.AUTH_SERVICE_URL,
     payload_key="resgister_data",
     authentication_required=False,
-    response_model=''
+    response_model='',
+    raw_body=True
 )
 async def register(resgister_data:RegisterSchema,request: Request, response: Response):
     pass
@@ -37,8 +51,12 @@ async def register(resgister_data:RegisterSchema,request: Request, response: Res
     status_code=status.HTTP_201_CREATED,
     service_url=settings.AUTH_SERVICE_URL,
     payload_key="delete_id",
-    authentication_required=False,
-    response_model=''
+    # logout revokes the caller's token, which the auth service learns
+    # from the generated X-Token-Id/X-Token-Expires headers
+    authentication_required=True,
+    service_authorization_checker=None,
+    response_model='',
+    raw_body=True
 )
 async def delete(delete_id: DeleteSchema,request: Request, response: Response):
     # erro r when the int value start with zero
@@ -50,8 +68,11 @@ async def delete(delete_id: DeleteSchema,request: Request, response: Response):
     status_code=status.HTTP_201_CREATED,
     service_url=settings.AUTH_SERVICE_URL,
     payload_key="update_data",
-    authentication_required=False,
-    response_model=''
+    # the auth service updates the user named by the generated X-User-Id
+    authentication_required=True,
+    service_authorization_checker=None,
+    response_model='',
+    raw_body=True
 )
 async def update(update_data:UpdateSchema,request: Request, response: Response):
     pass
@@ -72,3 +93,13 @@ async def image_upload_multiple(request:Request,response:Response,
                                 files: Annotated[List[UploadFile], File()] = []
                                 ):
     pass
+
+
+@app.post('/batch', status_code=status.HTTP_200_OK)
+async def batch(batch_data: BatchRequest, request: Request):
+    return await run_batch(request, batch_data)
+
+
+@app.get('/metrics', include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,184 @@
+"""
+Per-route latency histograms and counters, rendered as Prometheus text.
+
+Histograms and counters for a route are created when the route is
+registered, so the request path only bisects into a preallocated bucket
+list. Stage durations for the current request are added up in the
+``StageTimer`` held by ``current_stages``.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from conf.conf import settings
+from admission import bulkheads
+from cache import response_cache
+from hedging import hedge_budget
+from singleflight import singleflight
+from token_cache import token_cache
+from auth import revocation_list
+from loop_monitor import LoopMonitor
+from logs import log_pipeline
+
+STAGES = ('auth', 'payload', 'upstream', 'encode')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+ERROR_TYPES = {
+    401: 'unauthenticated',
+    403: 'forbidden',
+    429: 'rate_limited',
+    500: 'internal',
+    502: 'bad_gateway',
+    503: 'unavailable',
+    504: 'timeout',
+}
+
+
+def error_type(status_code: int) -> str:
+    return ERROR_TYPES.get(status_code, 'client_error' if status_code < 500 else 'server_error')
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class StageTimer:
+    """Seconds spent in each pipeline stage of one request"""
+    __slots__ = ('started',) + STAGES
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.auth = self.payload = self.upstream = self.encode = 0.0
+
+    def server_timing(self, total: float) -> str:
+        return (
+            f'auth;dur={self.auth * 1000:.2f}, payload;dur={self.payload * 1000:.2f}, '
+            f'upstream;dur={self.upstream * 1000:.2f}, encode;dur={self.encode * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}'
+        )
+
+
+# set by route() and for each /batch item; None outside a timed request
+current_stages: ContextVar[Optional[StageTimer]] = ContextVar('current_stages', default=None)
+
+
+class RouteMetrics:
+    __slots__ = ('labels', 'stages', 'total', 'statuses', 'errors')
+
+    def __init__(self, route: str, upstream: str, buckets: Tuple[float, ...]):
+        self.labels = f'route="{route}",upstream="{upstream}"'
+        self.stages = {stage: Histogram(buckets) for stage in STAGES}
+        self.total = Histogram(buckets)
+        self.statuses: Dict[int, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def observe(self, timer: StageTimer, total: float, status_code: int) -> None:
+        stages = self.stages
+        stages['auth'].observe(timer.auth)
+        stages['payload'].observe(timer.payload)
+        stages['upstream'].observe(timer.upstream)
+        stages['encode'].observe(timer.encode)
+        self.total.observe(total)
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+
+    def error(self, status_code: int) -> None:
+        kind = error_type(status_code)
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: List[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        # name -> callable returning {field: value}, exported as gauges
+        self.stats: Dict[str, Callable[[], Dict[str, float]]] = {
+            'token_cache': token_cache.stats,
+            'response_cache': response_cache.stats,
+            'singleflight': singleflight.stats,
+            'hedge_budget': hedge_budget.stats,
+            'revocations': revocation_list.stats,
+            'logging': log_pipeline.stats,
+        }
+
+    def route(self, route: str, upstream: str) -> RouteMetrics:
+        """The series for ``route``; methods registered on one path share it"""
+        metrics = self.routes.get((route, upstream))
+        if metrics is None:
+            metrics = self.routes[route, upstream] = RouteMetrics(route, upstream, self.buckets)
+        return metrics
+
+    def render(self) -> str:
+        lines = [
+            '# HELP gateway_stage_seconds Time spent in each stage of the proxy pipeline',
+            '# TYPE gateway_stage_seconds histogram',
+        ]
+        for metrics in self.routes.values():
+            for stage, histogram in metrics.stages.items():
+                lines.extend(histogram.render('gateway_stage_seconds', f'{metrics.labels},stage="{stage}"'))
+
+        lines += [
+            '# HELP gateway_request_seconds Total time spent handling proxied requests',
+            '# TYPE gateway_request_seconds histogram',
+        ]
+        for metrics in self.routes.values():
+            lines.extend(metrics.total.render('gateway_request_seconds', metrics.labels))
+
+        lines += [
+            '# HELP gateway_responses_total Proxied responses by status code',
+            '# TYPE gateway_responses_total counter',
+        ]
+        for metrics in self.routes.values():
+            for status_code, count in sorted(metrics.statuses.items()):
+                lines.append(f'gateway_responses_total{{{metrics.labels},status="{status_code}"}} {count}')
+
+        lines += [
+            '# HELP gateway_errors_total Proxied requests that failed, by error type',
+            '# TYPE gateway_errors_total counter',
+        ]
+        for metrics in self.routes.values():
+            for kind, count in sorted(metrics.errors.items()):
+                lines.append(f'gateway_errors_total{{{metrics.labels},type="{kind}"}} {count}')
+
+        for name, stats in self.stats.items():
+            for field, value in stats().items():
+                lines.append(f'# TYPE gateway_{name}_{field} gauge')
+                lines.append(f'gateway_{name}_{field} {value}')
+        if loop_monitor is not None:
+            lines.extend(loop_monitor.render('gateway'))
+        for field in ('in_flight', 'waiting'):
+            lines.append(f'# TYPE gateway_bulkhead_{field} gauge')
+            for service, stats in bulkheads.stats().items():
+                lines.append(f'gateway_bulkhead_{field}{{upstream="{service}"}} {stats[field]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry(settings.METRICS_BUCKETS)
+
+loop_monitor = (
+    LoopMonitor(settings.LOOP_MONITOR_INTERVAL, settings.LOOP_MONITOR_THRESHOLD)
+    if settings.LOOP_MONITOR_ENABLED
+    else None
+)
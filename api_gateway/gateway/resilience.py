@@ -0,0 +1,222 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from conf.conf import settings
+from deadline import remaining
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+RETRYABLE_STATUS_CODES = frozenset({502, 503, 504})
+
+
+class CircuitOpen(Exception):
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Circuit open, retry after {retry_after:.1f}s")
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one upstream service.
+
+    While closed, outcomes from the last ``window`` seconds are kept; once at
+    least ``min_calls`` were seen and the failure rate reaches
+    ``failure_rate`` the breaker opens and calls are rejected without
+    touching the network. After ``open_seconds`` up to ``half_open_calls``
+    probes are let through: any failure re-opens it, that many successes
+    close it. A probe that ends without an outcome (cancelled, or an error
+    that says nothing about the upstream) must give its slot back with
+    ``release()``.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        failure_rate: float,
+        window: float,
+        min_calls: int,
+        open_seconds: float,
+        half_open_calls: int
+    ):
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self.state = self.CLOSED
+        self._outcomes: deque = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        # bumped on every transition to half-open, so a late release() from
+        # an earlier probing round does not free a slot of the current one
+        self._round = 0
+
+    def _expire(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] <= now - self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self._failures = 0
+
+    def before_call(self) -> Optional[int]:
+        """
+        Raise ``CircuitOpen`` if the call must be shed. Returns the probing
+        round when the call is a half-open probe, to pass to ``release()``.
+        """
+        if self.state == self.CLOSED:
+            return None
+
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.open_seconds - now
+            if remaining > 0:
+                raise CircuitOpen(remaining)
+            self.state = self.HALF_OPEN
+            self._probes = self._probe_successes = 0
+            self._round += 1
+
+        if self._probes >= self.half_open_calls:
+            raise CircuitOpen(self.open_seconds)
+        self._probes += 1
+        return self._round
+
+    def release(self, probe: Optional[int]) -> None:
+        """Give back a probe slot taken by a call that recorded no outcome"""
+        if probe is not None and self.state == self.HALF_OPEN and probe == self._round and self._probes > 0:
+            self._probes -= 1
+
+    def record(self, failed: bool) -> None:
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            if failed:
+                self._open(now)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self.state = self.CLOSED
+            return
+        if self.state == self.OPEN:
+            return
+
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        self._expire(now)
+        if (
+            len(self._outcomes) >= self.min_calls
+            and self._failures / len(self._outcomes) >= self.failure_rate
+        ):
+            self._open(now)
+
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff"""
+    __slots__ = ('retries', 'backoff', 'max_backoff')
+
+    def __init__(self, retries: int, backoff: float, max_backoff: float):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+
+class CircuitBreakerRegistry:
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, service: str) -> CircuitBreaker:
+        breaker = self._breakers.get(service)
+        if breaker is None:
+            breaker = self._breakers[service] = CircuitBreaker(
+                failure_rate=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+                window=settings.CIRCUIT_BREAKER_WINDOW,
+                min_calls=settings.CIRCUIT_BREAKER_MIN_CALLS,
+                open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+                half_open_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS
+            )
+        return breaker
+
+    def states(self) -> Dict[str, str]:
+        return {service: breaker.state for service, breaker in self._breakers.items()}
+
+
+circuit_breakers = CircuitBreakerRegistry()
+
+default_retry_policy = RetryPolicy(
+    retries=settings.UPSTREAM_RETRIES,
+    backoff=settings.UPSTREAM_RETRY_BACKOFF,
+    max_backoff=settings.UPSTREAM_RETRY_MAX_BACKOFF
+)
+
+
+async def call_upstream(
+    send: Callable[[], Awaitable[httpx.Response]],
+    method: str,
+    breaker: Optional[CircuitBreaker] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    replayable: bool = True
+) -> httpx.Response:
+    """
+    Run ``send`` through the breaker and retry policy.
+
+    Connection errors, timeouts and 502/503/504 responses count as failures
+    and are retried only for idempotent methods with a replayable body, and
+    only while the request's deadline leaves room for the backoff.
+    Returns the last response, or re-raises the last ``httpx.RequestError``.
+    """
+    retries = 0
+    if retry_policy and replayable and method.upper() in IDEMPOTENT_METHODS:
+        retries = retry_policy.retries
+
+    attempt = 0
+    while True:
+        probe = breaker.before_call() if breaker is not None else None
+        response = last_error = None
+        recorded = False
+        try:
+            response = await send()
+        except httpx.RequestError as e:
+            if breaker is not None:
+                breaker.record(failed=True)
+                recorded = True
+            if attempt >= retries:
+                raise
+            last_error = e
+        else:
+            failed = response.status_code in RETRYABLE_STATUS_CODES
+            if breaker is not None:
+                breaker.record(failed=failed)
+                recorded = True
+            if not failed or attempt >= retries:
+                return response
+        finally:
+            # cancelled (deadline, hedge loser, client gone) or failed
+            # without an outcome: don't keep a half-open probe slot
+            if breaker is not None and not recorded:
+                breaker.release(probe)
+
+        delay = retry_policy.delay(attempt)
+        left = remaining()
+        if left is not None and left <= delay:
+            # no budget left for another attempt
+            if response is not None:
+                return response
+            raise last_error
+        if response is not None:
+            await response.aclose()
+        await asyncio.sleep(delay)
+        attempt += 1
@@ -0,0 +1,109 @@
+"""
+Revoked access tokens, by token id (``jti``).
+
+Lookups go through a Bloom filter first, so the common "not revoked" case
+is a few bit probes; only a possible hit consults the exact ``jti -> exp``
+map. Entries are dropped once their token has expired, which also
+rebuilds the filter since Bloom filters cannot delete.
+
+The auth service keeps revocations in its database; the gateway pulls
+them into this list with ``apply()`` (see ``auth.RevocationSync``).
+"""
+import hashlib
+import math
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class BloomFilter:
+    __slots__ = ('capacity', 'size', 'hashes', 'bits')
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        return ((h1 + i * h2) % size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        bits = self.bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001, purge_interval: float = 60.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+        self._entries: Dict[str, float] = {}
+        self._bloom = BloomFilter(capacity, error_rate)
+        self.bloom_hits = 0
+        self.false_positives = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _rebuild(self) -> None:
+        bloom = BloomFilter(max(self.capacity, 2 * len(self._entries)), self.error_rate)
+        for jti in self._entries:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    def revoke(self, jti: str, exp: float) -> None:
+        self.maybe_purge()
+        if exp <= time.time() or self._entries.get(jti, 0) >= exp:
+            return
+        self._entries[jti] = exp
+        if len(self._entries) > self._bloom.capacity:
+            self._rebuild()
+        else:
+            self._bloom.add(jti)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if not jti or jti not in self._bloom:
+            return False
+        self.bloom_hits += 1
+        exp = self._entries.get(jti)
+        if exp is None:
+            self.false_positives += 1
+            return False
+        return exp > time.time()
+
+    def purge(self) -> int:
+        """Forget tokens that have expired anyway"""
+        now = time.time()
+        expired = [jti for jti, exp in self._entries.items() if exp <= now]
+        if expired:
+            for jti in expired:
+                del self._entries[jti]
+            self._rebuild()
+        return len(expired)
+
+    def maybe_purge(self) -> None:
+        if time.monotonic() >= self._next_purge:
+            self._next_purge = time.monotonic() + self.purge_interval
+            self.purge()
+
+    def apply(self, revoked: Iterable[Tuple[str, float]]) -> None:
+        """Merge revocations pulled from the auth service"""
+        for jti, exp in revoked:
+            self.revoke(jti, exp)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'bloom_hits': self.bloom_hits,
+            'false_positives': self.false_positives,
+        }
@@ -0,0 +1,12 @@
+from typing import Any, List, Literal, Optional
+from pydantic import BaseModel, Field
+
+from conf.conf import settings
+
+class BatchItem(BaseModel):
+    method: Literal['GET', 'POST', 'PUT', 'PATCH', 'DELETE'] = 'GET'
+    path: str = Field(pattern=r'^/')
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem] = Field(min_length=1, max_length=settings.BATCH_MAX_ITEMS)
@@ -0,0 +1,49 @@
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from fastapi import Request
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one.
+
+    The first caller for a key starts the call as a task; callers arriving
+    while it is in flight await the same task and receive its result or
+    exception. A caller that goes away does not cancel the shared call.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.forwarded = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.forwarded += 1
+            task = self._calls[key] = asyncio.ensure_future(call())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'in_flight': len(self._calls),
+            'forwarded': self.forwarded,
+            'coalesced': self.coalesced,
+        }
+
+
+singleflight = SingleFlight()
+
+
+def default_coalesce_key(request: Request, service_headers: Dict[str, str]) -> Hashable:
+    """Requests share a call only if they carry the same credentials"""
+    authorization = request.headers.get('authorization', '')
+    return (
+        hashlib.blake2b(authorization.encode(), digest_size=16).digest(),
+        tuple(sorted(service_headers.items())),
+    )
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the gateway runs with its own directory as the import root (bare imports)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
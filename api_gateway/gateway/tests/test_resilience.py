@@ -0,0 +1,182 @@
+import asyncio
+
+import httpx
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpen, RetryPolicy, call_upstream
+
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    options = dict(failure_rate=0.5, window=60.0, min_calls=2, open_seconds=10.0, half_open_calls=1)
+    options.update(overrides)
+    return CircuitBreaker(**options)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        breaker.before_call()
+        breaker.record(failed=True)
+
+
+def response(status_code: int) -> httpx.Response:
+    return httpx.Response(status_code, request=httpx.Request('GET', 'http://upstream/'))
+
+
+def test_opens_at_failure_rate(clock):
+    breaker = make_breaker()
+    breaker.before_call()
+    breaker.record(failed=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+    breaker.record(failed=True)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_needs_min_calls_before_opening(clock):
+    breaker = make_breaker(min_calls=3)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record(failed=True)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_old_outcomes_leave_the_window(clock):
+    breaker = make_breaker(window=5.0)
+    breaker.before_call()
+    breaker.record(failed=True)
+    clock[0] += 6
+    breaker.before_call()
+    breaker.record(failed=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_limits_probes_and_closes_on_success(clock):
+    breaker = make_breaker(half_open_calls=2)
+    trip(breaker)
+    clock[0] += 10
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.record(failed=False)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(failed=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_failure_reopens(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock[0] += 10
+    breaker.before_call()
+    breaker.record(failed=True)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_release_frees_the_probe_slot(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock[0] += 10
+    probe = breaker.before_call()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.release(probe)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_release_from_an_earlier_round_is_ignored(clock):
+    breaker = make_breaker(half_open_calls=2)
+    trip(breaker)
+    clock[0] += 10
+    stale = breaker.before_call()
+    breaker.before_call()
+    breaker.record(failed=True)
+    clock[0] += 10
+    breaker.before_call()
+    breaker.before_call()
+    breaker.release(stale)
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_cancelled_probe_does_not_leak_its_slot(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock[0] += 10
+
+    async def hang():
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        task = asyncio.create_task(call_upstream(hang, 'GET', breaker))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await call_upstream(lambda: asyncio.sleep(0, response(200)), 'GET', breaker)
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unexpected_error_does_not_leak_its_slot(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock[0] += 10
+
+    async def broken():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(call_upstream(broken, 'GET', breaker))
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+
+
+def test_request_error_counts_as_failure(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock[0] += 10
+
+    async def refused():
+        raise httpx.ConnectError('refused')
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(call_upstream(refused, 'GET', breaker))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_retries_idempotent_requests_on_retryable_status():
+    statuses = iter([503, 200])
+
+    async def send():
+        return response(next(statuses))
+
+    policy = RetryPolicy(retries=2, backoff=0.0, max_backoff=0.0)
+    assert asyncio.run(call_upstream(send, 'GET', retry_policy=policy)).status_code == 200
+
+
+def test_does_not_retry_non_idempotent_requests():
+    calls = []
+
+    async def send():
+        calls.append(1)
+        return response(503)
+
+    policy = RetryPolicy(retries=2, backoff=0.0, max_backoff=0.0)
+    assert asyncio.run(call_upstream(send, 'POST', retry_policy=policy)).status_code == 503
+    assert len(calls) == 1
@@ -0,0 +1,86 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from conf.conf import settings
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified tokens.
+
+    Entries are keyed by a digest of the raw ``Authorization`` header plus
+    the hooks that produced them, and hold the decoded token payload and the
+    service headers generated from it. An entry expires after ``ttl``
+    seconds or at the token's ``exp`` claim, whichever comes first.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any, Dict[str, str]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(authorization: str, *hook_paths: Optional[str]) -> Tuple:
+        digest = hashlib.blake2b(authorization.encode(), digest_size=16).digest()
+        return (digest, *hook_paths)
+
+    def get(self, key: Tuple) -> Optional[Tuple[Any, Dict[str, str]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, payload, headers = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload, headers
+
+    def set(self, key: Tuple, payload: Any, headers: Dict[str, str]) -> None:
+        if self.maxsize <= 0:
+            return
+
+        expires_at = time.time() + self.ttl
+        exp = payload.get('exp') if isinstance(payload, dict) else None
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        if expires_at <= time.time():
+            return
+
+        self._entries[key] = (expires_at, payload, headers)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, authorization: Optional[str] = None) -> None:
+        """Drop every entry for ``authorization``, or the whole cache"""
+        if authorization is None:
+            self._entries.clear()
+            return
+        digest = self.key(authorization)[0]
+        for key in [key for key in self._entries if key[0] == digest]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+token_cache = TokenCache(
+    maxsize=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl=settings.AUTH_TOKEN_CACHE_TTL
+)
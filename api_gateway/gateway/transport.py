@@ -0,0 +1,128 @@
+"""
+How the gateway reaches each service.
+
+``tcp`` is the default: the pooled client connects to the service URL.
+``uds`` keeps HTTP but goes through a Unix domain socket (uvicorn --uds),
+which skips the loopback TCP stack when both processes share a host.
+``asgi`` imports the service's FastAPI app into the gateway process and
+calls it through ``httpx.ASGITransport``: no socket, no second server.
+The service URL is still used for routing and as the breaker/bulkhead key.
+
+A mounted service's modules are not importable by name once it is loaded
+(see ``load_service_app``), so anything that pickles its functions by
+reference, such as a spawn process pool, cannot work in-process. The auth
+service's password hasher falls back to threads there. A mounted service
+also shares the gateway's CPU and event loop.
+"""
+import os
+import sys
+from contextlib import AsyncExitStack
+from importlib import import_module
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import FastAPI
+
+from conf.conf import settings
+
+# identical in every service and kept shared, so a mounted service logs
+# through the gateway's queue and sees its request id
+SHARED_MODULES = {'logs'}
+
+
+def load_service_app(app_dir: str, target: str = 'main:app') -> FastAPI:
+    """
+    Import ``target`` from a service directory.
+
+    The services share top-level module names with the gateway (main, conf,
+    schema, deadline, ...), so the gateway's copies are set aside while the
+    service is imported and restored afterwards. The service keeps
+    references to its own modules.
+    """
+    app_dir = os.path.abspath(app_dir)
+    local_names = {
+        entry[:-3] if entry.endswith('.py') else entry
+        for entry in os.listdir(app_dir)
+        if entry.endswith('.py') or os.path.isdir(os.path.join(app_dir, entry))
+    } - SHARED_MODULES
+
+    def is_local(name: str) -> bool:
+        return name.split('.', 1)[0] in local_names
+
+    shadowed = {name: module for name, module in sys.modules.items() if is_local(name)}
+    for name in shadowed:
+        del sys.modules[name]
+    sys.path.insert(0, app_dir)
+    try:
+        module_name, attr = target.split(':', 1)
+        return getattr(import_module(module_name), attr)
+    finally:
+        sys.path.remove(app_dir)
+        for name in [name for name in sys.modules if is_local(name)]:
+            del sys.modules[name]
+        sys.modules.update(shadowed)
+
+
+def configured_services() -> List[Tuple[str, str, Optional[str], str]]:
+    return [
+        (
+            settings.AUTH_SERVICE_URL,
+            settings.AUTH_SERVICE_TRANSPORT,
+            settings.AUTH_SERVICE_UDS,
+            settings.AUTH_SERVICE_APP_DIR
+        ),
+        (
+            settings.MLDATASET_SERVICE_URL,
+            settings.MLDATASET_SERVICE_TRANSPORT,
+            settings.MLDATASET_SERVICE_UDS,
+            settings.MLDATASET_SERVICE_APP_DIR
+        ),
+    ]
+
+
+class ServiceTransports:
+    """httpx transports for the services not reached over plain TCP"""
+
+    def __init__(self):
+        self._transports: Dict[str, httpx.AsyncBaseTransport] = {}
+        self._stack: Optional[AsyncExitStack] = None
+
+    @staticmethod
+    def _base_url(url: str) -> str:
+        parsed = httpx.URL(url)
+        port = f':{parsed.port}' if parsed.port else ''
+        return f'{parsed.scheme}://{parsed.host}{port}'
+
+    async def start(self) -> None:
+        self._stack = AsyncExitStack()
+        for service_url, mode, uds, app_dir in configured_services():
+            base_url = self._base_url(service_url)
+            if mode == 'uds':
+                if not uds:
+                    raise RuntimeError(f"uds transport for {service_url} needs a socket path")
+                self._transports[base_url] = httpx.AsyncHTTPTransport(
+                    uds=uds,
+                    limits=httpx.Limits(
+                        max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY
+                    ),
+                    http2=settings.UPSTREAM_HTTP2
+                )
+            elif mode == 'asgi':
+                app = load_service_app(app_dir)
+                # ASGITransport does not send lifespan events, run them here
+                await self._stack.enter_async_context(app.router.lifespan_context(app))
+                self._transports[base_url] = httpx.ASGITransport(app=app)
+
+    async def stop(self) -> None:
+        self._transports.clear()
+        if self._stack is not None:
+            stack, self._stack = self._stack, None
+            await stack.aclose()
+
+    def get(self, url: str) -> Optional[httpx.AsyncBaseTransport]:
+        return self._transports.get(self._base_url(url))
+
+
+service_transports = ServiceTransports()
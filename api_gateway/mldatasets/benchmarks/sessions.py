@@ -0,0 +1,151 @@
+"""
+Request throughput of the old shared Session against per-request AsyncSessions.
+
+Every simulated request reads one row with ``latency_ms`` of server-side
+time (pg_sleep on Postgres, a sleeping SQL function on SQLite), with
+``concurrency`` requests in flight. Cases:
+
+- shared session: the old ``PostgresDb`` singleton. Requests run in a
+  thread pool as sync handlers do, and take turns on the one Session,
+  since it is not safe to use from several threads at once.
+- async, pool 1+2: a per-request AsyncSession on the old pool sizes.
+- async, pool 10+20: a per-request AsyncSession on the new default sizes.
+
+Run from the mldatasets directory:
+    python -m benchmarks.sessions [requests] [concurrency] [latency_ms]
+
+BENCH_DATABASE_URL picks the database (an async URL, e.g.
+postgresql+asyncpg://...); it defaults to a temporary SQLite file.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import String, create_engine, event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+ROWS = 100
+SYNC_DRIVERS = {'sqlite+aiosqlite': 'sqlite', 'postgresql+asyncpg': 'postgresql+psycopg2'}
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class BenchDataset(Base):
+    __tablename__ = 'bench_dataset'
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50))
+
+
+def sleep_ms(ms: float) -> int:
+    time.sleep(ms / 1000)
+    return 1
+
+
+def add_sleep_function(engine) -> None:
+    """Give SQLite connections a ``sleep_ms()`` that stands in for query time"""
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', lambda connection, _: connection.create_function('sleep_ms', 1, sleep_ms))
+
+
+def query(dialect: str, row_id: int, latency_ms: float):
+    delay = func.pg_sleep(latency_ms / 1000) if dialect == 'postgresql' else func.sleep_ms(latency_ms)
+    return select(BenchDataset.name, delay).where(BenchDataset.id == row_id)
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(name: str, started: float, timings) -> None:
+    elapsed = time.perf_counter() - started
+    print(
+        f'{name:22s} {len(timings) / elapsed:8.1f} req/s'
+        f'  p50 {percentile(timings, 0.5) * 1000:7.1f} ms  p99 {percentile(timings, 0.99) * 1000:7.1f} ms'
+    )
+
+
+async def shared_session_case(url: str, requests: int, concurrency: int, latency_ms: float) -> None:
+    sync_url = make_url(url)
+    sync_url = sync_url.set(drivername=SYNC_DRIVERS.get(sync_url.drivername, sync_url.drivername))
+    engine = create_engine(sync_url, pool_size=1, max_overflow=2)
+    add_sleep_function(engine)
+    session = Session(engine)
+    lock = threading.Lock()
+    timings = []
+
+    def handle(row_id: int) -> None:
+        begun = time.perf_counter()
+        with lock:
+            session.execute(query(engine.dialect.name, row_id, latency_ms)).one()
+            session.rollback()
+        timings.append(time.perf_counter() - begun)
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            loop.run_in_executor(executor, handle, i % ROWS + 1) for i in range(requests)
+        ))
+        report('shared session', started, timings)
+    session.close()
+    engine.dispose()
+
+
+async def async_session_case(url: str, requests: int, concurrency: int, latency_ms: float,
+                             pool_size: int, max_overflow: int) -> None:
+    engine = create_async_engine(url, pool_size=pool_size, max_overflow=max_overflow)
+    add_sleep_function(engine.sync_engine)
+    sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def handle(row_id: int) -> None:
+        async with semaphore:
+            begun = time.perf_counter()
+            async with sessions() as session:
+                (await session.execute(query(engine.dialect.name, row_id, latency_ms))).one()
+            timings.append(time.perf_counter() - begun)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handle(i % ROWS + 1) for i in range(requests)))
+    report(f'async, pool {pool_size}+{max_overflow}', started, timings)
+    await engine.dispose()
+
+
+async def main(requests: int = 500, concurrency: int = 50, latency_ms: int = 5) -> None:
+    url = os.environ.get('BENCH_DATABASE_URL') or (
+        'sqlite+aiosqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    )
+    engine = create_async_engine(url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(
+            BenchDataset.__table__.insert(),
+            [{'id': i, 'name': f'dataset-{i}'} for i in range(1, ROWS + 1)]
+        )
+    await engine.dispose()
+
+    print(f'{requests} requests, {concurrency} in flight, {latency_ms} ms per query')
+    try:
+        await shared_session_case(url, requests, concurrency, latency_ms)
+        await async_session_case(url, requests, concurrency, latency_ms, pool_size=1, max_overflow=2)
+        await async_session_case(url, requests, concurrency, latency_ms, pool_size=10, max_overflow=20)
+    finally:
+        engine = create_async_engine(url)
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:4])))
@@ -1,26 +1,23 @@
-from typing import Annotated
+from typing import Annotated, AsyncIterator, Iterator
 
 from fastapi import Depends
-from session import SessionLocal
+from session import AsyncSessionLocal, SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Annotated
-from fastapi import Depends
 
-from sqlalchemy.orm import Session
 
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """One session per request; its connection goes back to the pool afterwards"""
+    async with AsyncSessionLocal() as session:
+        yield session
 
-class PostgresDb():
-    _instances = {}
 
-    def __new__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(
-                PostgresDb, cls).__new__(cls, *args, **kwargs)
-            cls._instances[cls]._session = SessionLocal()
-        return cls._instances[cls]
+def get_session() -> Iterator[Session]:
+    with SessionLocal() as session:
+        yield session
 
-    def session(self) -> Session:
-        return self._session
 
-pg_session_dependency = Annotated[Session, Depends(PostgresDb().session)]
-db_dependency = pg_session_dependency
\ No newline at end of file
+pg_session_dependency = Annotated[AsyncSession, Depends(get_async_session)]
+db_dependency = pg_session_dependency
+# for code still on the sync BaseCrud
+sync_session_dependency = Annotated[Session, Depends(get_session)]
@@ -36,8 +36,12 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
-    POSTGRES_POOL_SIZE: int = 1
-    POSTGRES_MAX_POOL: int = 2
+    # connections kept open per process, and extra ones opened under bursts;
+    # a request waits up to POSTGRES_POOL_TIMEOUT seconds for a connection
+    POSTGRES_POOL_SIZE: int = 10
+    POSTGRES_MAX_POOL: int = 20
+    POSTGRES_POOL_TIMEOUT: float = 10.0
+    POSTGRES_POOL_RECYCLE: int = 1800
     POSTGRES_ENGINE_ECHO: bool = False
     SQLALCHEMY_DATABASE_URL_LOCAL: AnyHttpUrl = Field((
         "sqlite:///sql.db"),  validate_default=False)  # if DEV is local
@@ -61,6 +65,27 @@ class Settings(BaseSettings):
         database=config("POSTGRES_DB")
     ),  validate_default=False)
 
+    # async engine, used by the per-request AsyncSession dependency
+    SQLALCHEMY_ASYNC_DATABASE_URL_LOCAL: str = "sqlite+aiosqlite:///sql.db"
+
+    SQLALCHEMY_ASYNC_DATABASE_URL_DEV: AnyHttpUrl = Field(sql_db_uri(
+        drivername='postgresql+asyncpg',
+        username=config("POSTGRES_USER", cast=str),
+        password=config('POSTGRES_PASSWORD', cast=str),
+        host=config("POSTGRES_HOST", cast=str),
+        port=config("POSTGRES_PORT", cast=int),
+        database=config("POSTGRES_DB", cast=str)
+    ),  validate_default=False)
+
+    SQLALCHEMY_ASYNC_DATABASE_URL_PROD: AnyHttpUrl = Field(sql_db_uri(
+        drivername='postgresql+asyncpg',
+        username=config("POSTGRES_USER"),
+        password=config('POSTGRES_PASSWORD'),
+        host=config("POSTGRES_HOST"),
+        port=config("POSTGRES_PORT"),
+        database=config("POSTGRES_DB")
+    ),  validate_default=False)
+
     class Config:
         env_file = '.env'
 
@@ -0,0 +1,86 @@
+from fastapi import HTTPException
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class AsyncBaseCrud:
+    """``BaseCrud`` for an ``AsyncSession``; same methods, awaited"""
+
+    def __init__(self, db: AsyncSession, Model=None):
+        self.db = db
+        self.obj = None
+        self.Model = Model
+
+    def missing_obj(self, obj, _id=0):
+        if obj is None:
+            raise HTTPException(
+                status_code=404, detail=f"Object with id {_id} not found.")
+
+    def pagination_query(self, query, page: int = 1, page_size: int = 10):
+        if page_size:
+            query = query.limit(page_size)
+        if page - 1:
+            query = query.offset((page-1)*page_size)
+        return query
+
+    async def pagination(self, query, page=1, page_size=10):
+        result = await self.db.scalars(self.pagination_query(query, page, page_size))
+        return result.all()
+
+    async def get(self, id: int):
+        self.obj = await self.db.get(self.Model, id)
+        self.missing_obj(self.obj, id)
+        return self.obj
+
+    async def create_many(self, data_list):
+        obj_list = [self.Model(**data) for data in data_list]
+        self.db.add_all(obj_list)
+        await self.db.commit()
+        return obj_list
+
+    async def search(self, query: str, page: int = 1, page_size: int = 20):
+        searchects = sa.select(
+            self.Model
+        ).where(
+            self.Model.name.match(query)
+        ).order_by(
+            sa.desc(self.Model.modified_at)
+        )
+        return await self.pagination(searchects, page, page_size)
+
+    async def get_all(self, page=0, page_size=10):
+        query = sa.select(self.Model).order_by(
+            sa.desc(self.Model.modified_at))
+        return await self.pagination(query, page, page_size)
+
+    async def commit(self, obj):
+        await self.db.commit()
+        await self.db.refresh(obj)
+        return obj
+
+    async def create(self, data: dict):
+        obj = self.Model(**data)
+        self.db.add(obj)
+        return await self.commit(obj)
+
+    async def update(self, data: dict):
+        obj = await self.get(data['id'])
+        return await self.update_obj(obj, data)
+
+    async def update_obj(self, obj, data: dict):
+        self.missing_obj(obj, data.get('id', 0))
+        if 'id' in data: data.pop('id')
+        for key, value in data.items():
+            setattr(obj, key, value)
+        await self.commit(obj)
+        return obj
+
+    async def delete(self, id: int):
+        obj = await self.get(id)
+        return await self.delete_obj(obj)
+
+    async def delete_obj(self, obj):
+        self.missing_obj(obj)
+        if obj:
+            await self.db.delete(obj)
+            await self.db.commit()
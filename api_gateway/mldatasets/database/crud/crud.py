@@ -1,6 +1,8 @@
 from api_gateway.mldatasets.database.crud.base import BaseCrud
+from api_gateway.mldatasets.database.crud.async_base import AsyncBaseCrud
 
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import sqlalchemy as sa 
 from sqlalchemy import select
 from mldatasets.database.models.model import MLDataset,MLDatasetFiles,MLDatasetFolder
@@ -40,3 +42,34 @@ class MLDatasetFilesCrud(BaseCrud):
     
     def upload_file(self,payload:dict):
         return self.create(payload)
+
+
+class AsyncMLDatasetCrud(AsyncBaseCrud):
+    def __init__(self, db_session: AsyncSession):
+        super().__init__(db_session,MLDataset)
+
+    async def create_folder(self,payload:dict):
+        return await self.create(payload)
+
+    async def get_all_dataset(self, page=0, page_size=10):
+        return await super().get_all(page, page_size)
+
+    async def get_dataset(self,id):
+        return await self.get(id)
+
+    async def delete_dataset(self,id):
+        return await self.delete(id)
+
+class AsyncMLDatasetFolderCrud(AsyncBaseCrud):
+    def __init__(self, db_session: AsyncSession):
+        super().__init__(db_session,MLDatasetFolder)
+
+    async def create_folder(self,payload:dict):
+        return await self.create(payload)
+
+class AsyncMLDatasetFilesCrud(AsyncBaseCrud):
+    def __init__(self, db_session: AsyncSession):
+        super().__init__(db_session,MLDatasetFiles)
+
+    async def upload_file(self,payload:dict):
+        return await self.create(payload)
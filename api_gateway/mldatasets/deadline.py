@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+
+# remaining budget in milliseconds, set by the gateway on every proxied call
+DEADLINE_HEADER = b'x-request-deadline-ms'
+
+current_deadline: ContextVar[Optional[float]] = ContextVar('current_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def remaining() -> Optional[float]:
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """Raise ``DeadlineExceeded`` once the caller has given up on the request"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+class DeadlineMiddleware:
+    """
+    Honor the gateway's deadline header: the request is cancelled when its
+    budget runs out and answered with 504 if nothing was sent yet.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        budget = None
+        if scope['type'] == 'http':
+            for name, value in scope['headers']:
+                if name == DEADLINE_HEADER:
+                    try:
+                        budget = int(value) / 1000
+                    except ValueError:
+                        pass
+                    break
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message['type'] == 'http.response.start':
+                started = True
+            await send(message)
+
+        token = current_deadline.set(time.monotonic() + budget)
+        try:
+            async with asyncio.timeout(max(0.0, budget)):
+                await self.app(scope, receive, send_wrapper)
+        except (TimeoutError, DeadlineExceeded):
+            if not started:
+                response = JSONResponse(
+                    {'detail': 'Request deadline exceeded'},
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT
+                )
+                await response(scope, receive, send)
+        finally:
+            current_deadline.reset(token)
+
+
+def copy_with_deadline(
+    source,
+    destination,
+    chunk_size: int = 1024 * 1024,
+    stop: Optional[threading.Event] = None
+) -> None:
+    """
+    ``shutil.copyfileobj`` that stops between chunks once the budget is gone,
+    or once ``stop`` is set by a caller that no longer waits for it
+    """
+    while True:
+        check_deadline()
+        if stop is not None and stop.is_set():
+            raise DeadlineExceeded("Copy abandoned")
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        destination.write(chunk)
+
+
+def apply_statement_timeout(db) -> None:
+    """Bound the current transaction's statements by the remaining budget (Postgres)"""
+    left = remaining()
+    if left is None or db.get_bind().dialect.name != 'postgresql':
+        return
+    check_deadline()
+    db.execute(text(f"SET LOCAL statement_timeout = {max(1, int(left * 1000))}"))
+
+
+async def apply_async_statement_timeout(db) -> None:
+    """``apply_statement_timeout`` for an ``AsyncSession``"""
+    left = remaining()
+    if left is None or db.get_bind().dialect.name != 'postgresql':
+        return
+    check_deadline()
+    await db.execute(text(f"SET LOCAL statement_timeout = {max(1, int(left * 1000))}"))
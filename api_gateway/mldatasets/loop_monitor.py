@@ -0,0 +1,130 @@
+"""
+Opt-in event loop lag monitor.
+
+A sentinel task sleeps for ``interval`` and records how late it wakes up:
+that delay is time the loop spent running code that did not yield. The
+sentinel cannot see the culprit, since it only runs once the loop is
+free again, so a watchdog thread checks the sentinel's heartbeat and,
+when it is older than ``threshold``, logs the stack of the loop's thread
+while it is still blocked.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self.counts = [0] * (len(LAG_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self.blocked = 0
+        self.heartbeat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+
+    def observe(self, lag: float) -> None:
+        self.counts[bisect_left(LAG_BUCKETS, lag)] += 1
+        self.sum += lag
+        self.count += 1
+        self.max = max(self.max, lag)
+
+    async def _sentinel(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.heartbeat = time.monotonic()
+            self.observe(lag)
+            if lag >= self.threshold:
+                logger.warning('Event loop blocked for %.1f ms', lag * 1000)
+
+    def _watch(self) -> None:
+        reported = None
+        while not self._stopped.wait(self.interval):
+            heartbeat = self.heartbeat
+            if heartbeat == reported or time.monotonic() - heartbeat < self.threshold + self.interval:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            reported = heartbeat
+            self.blocked += 1
+            logger.warning(
+                'Event loop blocked for over %.1f ms, loop thread stack:\n%s',
+                (time.monotonic() - heartbeat) * 1000,
+                ''.join(traceback.format_stack(frame))
+            )
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sentinel())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-monitor', daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._watchdog.join()
+        self._watchdog = None
+
+    def render(self, prefix: str) -> List[str]:
+        """Prometheus text lines for the lag histogram"""
+        name = f'{prefix}_event_loop_lag_seconds'
+        lines = [
+            f'# HELP {name} How late the loop monitor sentinel woke up',
+            f'# TYPE {name} histogram',
+        ]
+        cumulative = 0
+        for bound, count in zip(LAG_BUCKETS, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [
+            f'{name}_bucket{{le="+Inf"}} {self.count}',
+            f'{name}_sum {self.sum}',
+            f'{name}_count {self.count}',
+            f'# TYPE {prefix}_event_loop_lag_max_seconds gauge',
+            f'{prefix}_event_loop_lag_max_seconds {self.max}',
+            f'# TYPE {prefix}_event_loop_blocked_total counter',
+            f'{prefix}_event_loop_blocked_total {self.blocked}',
+        ]
+        return lines
+
+
+@asynccontextmanager
+async def monitored(monitor: Optional[LoopMonitor]):
+    """Run ``monitor`` for the lifetime of the block, if one is given"""
+    if monitor is not None:
+        monitor.start()
+    try:
+        yield
+    finally:
+        if monitor is not None:
+            await monitor.stop()
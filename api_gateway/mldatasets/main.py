@@ -1,40 +1,59 @@
+import logging
 from fastapi import FastAPI,status
 from pathlib import Path
 from schema.ml_schema import TextSchema
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from deadline import DeadlineMiddleware
+from logs import RequestIdMiddleware, setup_logging
+from loop_monitor import LoopMonitor, monitored
+from decouple import config
 from typing import List
 from pydantic import BaseModel
-from fastapi import File,UploadFile
-from typing import Any
-import base64
-app=FastAPI()
+from fastapi import File,UploadFile,Form
+from typing import Any,Annotated
+setup_logging(
+    "mldatasets",
+    config("LOG_LEVEL", default="INFO"),
+    config("LOG_DEBUG_SAMPLE_RATE", default=0.01, cast=float),
+    config("LOG_QUEUE_SIZE", default=10000, cast=int)
+)
+logger = logging.getLogger(__name__)
+loop_monitor = (
+    LoopMonitor(
+        config("LOOP_MONITOR_INTERVAL", default=0.1, cast=float),
+        config("LOOP_MONITOR_THRESHOLD", default=0.1, cast=float)
+    )
+    if config("LOOP_MONITOR_ENABLED", default=False, cast=bool)
+    else None
+)
+app=FastAPI(lifespan=lambda app: monitored(loop_monitor))
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(RequestIdMiddleware)
 
 
-class FileUploadRequest(BaseModel):
-    file_name: str
-    files: List[dict]
+@app.get('/health',status_code=status.HTTP_200_OK)
+async def health():
+    return {"status":"ok"}
 
-def re_encode(content: str) -> str:  
-    encoded= base64.b64decode(content).decode('utf-8')
-    return encoded
-
-def re_encode_img(content: str) -> str:  
-    encoded= base64.b64decode(content)
-    return encoded
 
+@app.get('/metrics',include_in_schema=False)
+async def metrics():
+    lines = loop_monitor.render("mldatasets") if loop_monitor is not None else []
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.post('/form_files',status_code=status.HTTP_201_CREATED)
-async def image_upload_multiple(data:FileUploadRequest):
+async def image_upload_multiple(file_name: Annotated[str, Form()],
+                                files: Annotated[List[UploadFile], File()] = []):
     try:
-        print(data.file_name)
-        for i in data.files:
-            if i['content_type'].split('/')[0] == 'image':
-                print("image file actins started")
-            elif i['content_type'].split('/')[0] == 'text':
-                print("text file actions started")
-                print(re_encode(i['content']))
+        logger.info("form upload", extra={"file_name": file_name, "files": len(files)})
+        for i in files:
+            content_type = i.content_type or 'application/octet-stream'
+            if content_type.split('/')[0] == 'image':
+                logger.debug("image file received", extra={"upload_name": i.filename, "size": i.size})
+            elif content_type.split('/')[0] == 'text':
+                logger.debug("text file received", extra={"upload_name": i.filename, "size": i.size})
         return JSONResponse(content={"message":"formdata successful"},status_code=status.HTTP_201_CREATED)
     except Exception as err:
-        print("excepr from ml dataet ",str(err))
+        logger.exception("form upload failed")
         return JSONResponse(content={"message":"form data not success"},status_code=status.HTTP_400_BAD_REQUEST)
@@ -1,20 +1,54 @@
+import asyncio
 import os 
 import uuid
+import logging
 import shutil
+import threading
 from pathlib import Path
 from fastapi import status, HTTPException
 from conf.db_config import pg_session_dependency
 import json
-from database.crud.crud import MLDatasetCrud,MLDatasetFolderCrud, MLDatasetFilesCrud
+from database.crud.crud import AsyncMLDatasetCrud,AsyncMLDatasetFolderCrud, AsyncMLDatasetFilesCrud
 from fastapi_api_gateway.api_gateway.mldatasets.schema.ml_schema import MLDatasetSchema, MLDatasetFolderSchema
 import shutil
+from deadline import DeadlineExceeded, apply_async_statement_timeout, copy_with_deadline
+logger = logging.getLogger(__name__)
 static_dir = "static/mldatabase"
 os.makedirs(static_dir, exist_ok=True)
 
+
+def write_upload(source, file_location: Path, stop: threading.Event) -> None:
+    with file_location.open("wb") as buffer:
+        copy_with_deadline(source, buffer, stop=stop)
+
+
+async def save_upload(source, file_location: Path) -> None:
+    """
+    Write an upload in a worker thread. If the write does not complete
+    (deadline, cancellation, I/O error) the thread is told to stop, and
+    the partial file is removed once it has.
+    """
+    stop = threading.Event()
+    copy = asyncio.ensure_future(asyncio.to_thread(write_upload, source, file_location, stop))
+    try:
+        # shielded, so a cancellation here does not abandon the thread
+        # before it is done with the file
+        await asyncio.shield(copy)
+    except BaseException:
+        stop.set()
+        try:
+            await asyncio.wait({copy})
+            if not copy.cancelled():
+                copy.exception()  # already being raised or superseded
+        finally:
+            file_location.unlink(missing_ok=True)
+        raise
+
 class MLDatasetService:
     @staticmethod
-    def create_database(payload:MLDatasetSchema,db:pg_session_dependency):
+    async def create_database(payload:MLDatasetSchema,db:pg_session_dependency):
         try:
+            await apply_async_statement_timeout(db)
             unique_end=uuid.uuid4().hex[:8]
             unique_name=f"{payload.name}_{unique_end}"
             unique_path=Path(static_dir)/unique_name
@@ -28,12 +62,9 @@ class MLDatasetService:
                 "storage": payload.storage,
                 "visible":payload.visible
             }
-            print("phase2")
-            print(new_payload)
             try:
-                obj=MLDatasetCrud(db).create_folder(new_payload)
-                print("obj is generated",obj)
-                print("Object contents:", obj.__dict__ if hasattr(obj, '__dict__') else obj)
+                obj=await AsyncMLDatasetCrud(db).create_folder(new_payload)
+                logger.info("dataset created", extra={"dataset_id": obj.id, "path": new_payload["path"]})
                 return True,obj
             except Exception as e:
                 return False,f"unexcepted error is {str(e)}"
@@ -41,69 +72,65 @@ class MLDatasetService:
             return False,f"unexcepted error is {str(err)}"
         
     @staticmethod  
-    def create_folder(payload:MLDatasetFolderSchema,db:pg_session_dependency):
+    async def create_folder(payload:MLDatasetFolderSchema,db:pg_session_dependency):
         try:
+            await apply_async_statement_timeout(db)
             obj=None
             if payload.dataset_id == 0:
-                obj=MLDatasetFolderCrud(db).get(payload.parent_folder_id)
+                obj=await AsyncMLDatasetFolderCrud(db).get(payload.parent_folder_id)
             if payload.parent_folder_id == 0:
-                obj=MLDatasetCrud(db).get(payload.dataset_id)
+                obj=await AsyncMLDatasetCrud(db).get(payload.dataset_id)
             if obj is None:
                 detail="dataset not found" if payload.dataset_id is not None else "folder not found"
                 return False,detail
-            print("phase1")
             unique_end=uuid.uuid4().hex[:8]
             unique_name=f"{payload.name}_{unique_end}"
             unique_path=Path(obj.path)/unique_name
-            print("phase2")
             try:
                 unique_path.mkdir(parents=True,exist_ok=False)
             except FileExistsError:
                 return False,"folder is already created please retry"
-            print("phase3")
             new_payload={
                 'name':payload.folder_name,
                 'path':str(unique_path),
                 'dataset_id':payload.dataset_id,
                 'parent_folder_id':payload.parent_folder_id               
             }
-            print("phase4")
             if payload.parent_folder_id == 0:
                 del new_payload['parent_folder_id']
             if payload.dataset_id == 0:
                 del new_payload['dataset_id']
-            obj=MLDatasetFolderCrud(db).create_folder(new_payload)
-            print('send before [ay;oad]',obj)
-            print("phase5")
+            obj=await AsyncMLDatasetFolderCrud(db).create_folder(new_payload)
+            logger.info("folder created", extra={"folder_id": obj.id, "path": new_payload["path"]})
             return True,obj
         except Exception as err:
             return False,f"unexcepted error is {str(err)}"
 
     @staticmethod        
-    def delete_database(Id:int,db:pg_session_dependency):
+    async def delete_database(Id:int,db:pg_session_dependency):
         try:
-            obj_path=MLDatasetCrud(db).get(Id)
-            print("obj_path",obj_path)
-            print("pahse 1")
+            await apply_async_statement_timeout(db)
+            obj_path=await AsyncMLDatasetCrud(db).get(Id)
+            logger.debug("deleting dataset", extra={"dataset_id": Id})
             if not os.path.exists(obj_path.path):
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Folder with this path  not found")
-            shutil.rmtree(obj_path.path)
-            obj=MLDatasetCrud(db).get(Id)
+            await asyncio.to_thread(shutil.rmtree, obj_path.path)
+            obj=await AsyncMLDatasetCrud(db).get(Id)
             if obj is None:
                 return False
-            obj=MLDatasetCrud(db).delete_dataset(Id)
+            obj=await AsyncMLDatasetCrud(db).delete_dataset(Id)
             return True
         except Exception as e:
-            print('error in delete dataset',(e))
+            logger.warning("dataset delete failed", extra={"dataset_id": Id}, exc_info=True)
             raise HTTPException(status_code=404,detail="Dataset not found")
             
     @staticmethod
-    def delete_folder(id:int,db:pg_session_dependency):
+    async def delete_folder(id:int,db:pg_session_dependency):
         try:
-            if MLDatasetFolderCrud(db).delete(id):
+            if await AsyncMLDatasetFolderCrud(db).delete(id):
                 return True
-        except Exception as e:
-            print(e)
+        except Exception:
+            logger.exception("folder delete failed")
             return False
     
     @staticmethod
@@ -122,24 +149,25 @@ class MLDatasetService:
             return False
 
     @staticmethod 
-    def create_files(db:pg_session_dependency,payload:any,files:any):
+    async def create_files(db:pg_session_dependency,payload:any,files:any):
         try:
+            await apply_async_statement_timeout(db)
             dataset_id = payload.get('dataset_id')
             folder_id = payload.get('dataset_folder_id')
             if dataset_id is None:
-                obj = MLDatasetFolderCrud(db).get(folder_id)
+                obj = await AsyncMLDatasetFolderCrud(db).get(folder_id)
             else:
-                obj = MLDatasetCrud(db).get(dataset_id)
+                obj = await AsyncMLDatasetCrud(db).get(dataset_id)
 
             if obj is None:
                 return False,f"dataset or folder not found"
-            obj1=MLDatasetFilesCrud(db)
+            obj1=AsyncMLDatasetFilesCrud(db)
             for file in files:
                 target_path = Path(obj.path)
                 os.makedirs(str(target_path), exist_ok=True)
                 file_location = Path(target_path).joinpath(file.filename)
-                with file_location.open("wb") as buffer:
-                    shutil.copyfileobj(file.file, buffer)
+                # blocking file I/O, off the event loop
+                await save_upload(file.file, file_location)
                 file_payload={
                     "file_name":file.filename,
                     "file_path":str(file_location),
@@ -148,8 +176,10 @@ class MLDatasetService:
                     "content_type":file.content_type,
                     "file_size":file.size
                 }
-                obj1.upload_file(file_payload)
+                await obj1.upload_file(file_payload)
             return True,f"files uploaded successfully"
+        except DeadlineExceeded:
+            raise
         except Exception as err:
-            print(err)
+            logger.exception("file upload failed")
             return False
\ No newline at end of file
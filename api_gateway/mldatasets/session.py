@@ -1,14 +1,19 @@
 from conf.settings import settings
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 if settings.DEBUG:
     if settings.ENV == "local":
         DB_URI = settings.SQLALCHEMY_DATABASE_URL_LOCAL
+        ASYNC_DB_URI = settings.SQLALCHEMY_ASYNC_DATABASE_URL_LOCAL
     else:
         DB_URI = settings.SQLALCHEMY_DATABASE_URL_DEV
+        ASYNC_DB_URI = settings.SQLALCHEMY_ASYNC_DATABASE_URL_DEV
 else:
     DB_URI = settings.SQLALCHEMY_DATABASE_URL_PROD
+    ASYNC_DB_URI = settings.SQLALCHEMY_ASYNC_DATABASE_URL_PROD
 
 engine = create_engine(
     DB_URI,
@@ -19,3 +24,27 @@ engine = create_engine(
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def pool_options(url) -> dict:
+    # in-memory SQLite uses a single static connection, sized pools don't apply
+    if make_url(url).database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.POSTGRES_POOL_SIZE,
+        "max_overflow": settings.POSTGRES_MAX_POOL,
+        "pool_timeout": settings.POSTGRES_POOL_TIMEOUT,
+        "pool_recycle": settings.POSTGRES_POOL_RECYCLE,
+    }
+
+
+# the URL object itself: str() would mask the password
+async_engine = create_async_engine(
+    ASYNC_DB_URI,
+    pool_pre_ping=True,
+    echo=settings.POSTGRES_ENGINE_ECHO,
+    **pool_options(ASYNC_DB_URI)
+)
+
+# objects stay usable after commit, handlers return them once the session is closed
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)